@@ -0,0 +1,71 @@
+import json
+import platform
+import random
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any
+
+from pixel_font_knife.mono_bitmap import MonoBitmap
+
+
+def create_random_bitmap(rng: random.Random, size: int) -> MonoBitmap:
+    bitmap = MonoBitmap.create(size, size)
+    margin = max(1, size // 8)
+    for _ in range(max(2, size // 3)):
+        if rng.random() < 0.5:
+            y = rng.randrange(margin, size - margin)
+            x0 = rng.randrange(margin, size - margin)
+            x1 = rng.randrange(x0, size - margin)
+            for x in range(x0, x1 + 1):
+                bitmap[y][x] = 1
+        else:
+            x = rng.randrange(margin, size - margin)
+            y0 = rng.randrange(margin, size - margin)
+            y1 = rng.randrange(y0, size - margin)
+            for y in range(y0, y1 + 1):
+                bitmap[y][x] = 1
+    return bitmap
+
+
+def create_random_bitmaps(size: int, count: int, seed: int = 0) -> list[MonoBitmap]:
+    rng = random.Random(seed)
+    return [create_random_bitmap(rng, size) for _ in range(count)]
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def create_result(name: str, seconds: float, items: int, **params: Any) -> dict[str, Any]:
+    return {
+        'name': name,
+        'params': params,
+        'items': items,
+        'seconds': seconds,
+        'seconds_per_item': seconds / items if items > 0 else None,
+    }
+
+
+def write_report(suite: str, results: list[dict[str, Any]], output_path: Path | None):
+    report = {
+        'suite': suite,
+        'created_at': datetime.now(UTC).isoformat(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if output_path is None:
+        print(text)
+    else:
+        output_path.write_text(f'{text}\n', 'utf-8')
@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import bench_util
+
+project_root_dir = Path(__file__).parent.joinpath('..').resolve()
+
+default_modules = [
+    'pixel_font_knife.mono_bitmap',
+    'pixel_font_knife.glyph_file_util',
+    'pixel_font_knife.glyph_mapping_util',
+    'pixel_font_knife.kerning_util',
+]
+
+heavy_modules = [
+    'yaml',
+    'unidata_blocks',
+    'pixel_font_knife.internal.png',
+    'concurrent.futures',
+]
+
+probe_code = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({
+    'seconds': seconds,
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+'''
+
+
+def run_import_probe(module: str) -> dict:
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(project_root_dir.joinpath('src')), env.get('PYTHONPATH')]))
+    output = subprocess.run(
+        [sys.executable, '-c', probe_code, module, *heavy_modules],
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def run_import_benchmarks(modules: list[str], repeat: int) -> list[dict]:
+    results = []
+    for module in modules:
+        probes = [run_import_probe(module) for _ in range(repeat)]
+        result = bench_util.create_result(module, min(probe['seconds'] for probe in probes), 1, repeat=repeat)
+        result['loaded_heavy_modules'] = probes[0]['loaded']
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of pixel_font_knife modules in fresh interpreters.')
+    parser.add_argument('--modules', nargs='+', default=default_modules)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=Path, default=None)
+    args = parser.parse_args()
+
+    bench_util.write_report('import', run_import_benchmarks(args.modules, args.repeat), args.output)
+
+
+if __name__ == '__main__':
+    main()
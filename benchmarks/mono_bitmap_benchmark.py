@@ -0,0 +1,117 @@
+import argparse
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+import bench_util
+from pixel_font_knife import glyph_file_util, kerning_util
+from pixel_font_knife.kerning_util import KerningConfig
+from pixel_font_knife.mono_bitmap import MonoBitmap
+
+project_root_dir = Path(__file__).parent.joinpath('..').resolve()
+glyphs_dir = project_root_dir.joinpath('assets', 'glyphs')
+
+
+def run_bitmap_benchmarks(size: int, count: int, repeat: int) -> list[dict]:
+    bitmaps = bench_util.create_random_bitmaps(size, count)
+    other = bench_util.create_random_bitmaps(size, 1, seed=1)[0]
+    params = {'size': size, 'count': count}
+
+    cases = {
+        'pixel_expand': lambda: [bitmap.pixel_expand(1) for bitmap in bitmaps],
+        'plus': lambda: [bitmap.plus(other, x=1) for bitmap in bitmaps],
+        'minus': lambda: [bitmap.minus(other, x=1) for bitmap in bitmaps],
+        'is_overlapped': lambda: [bitmap.is_overlapped(other, x=size // 2) for bitmap in bitmaps],
+        'resize': lambda: [bitmap.resize(left=1, right=1, top=1, bottom=1) for bitmap in bitmaps],
+        'crop': lambda: [bitmap.crop(1, 1, size - 2, size - 2) for bitmap in bitmaps],
+        'scale': lambda: [bitmap.scale(2, 2) for bitmap in bitmaps],
+        'calculate_padding': lambda: [(
+            bitmap.calculate_left_padding(),
+            bitmap.calculate_right_padding(),
+            bitmap.calculate_top_padding(),
+            bitmap.calculate_bottom_padding(),
+        ) for bitmap in bitmaps],
+    }
+    return [bench_util.create_result(name, bench_util.measure(func, repeat), count, **params) for name, func in cases.items()]
+
+
+def run_png_benchmarks(size: int, count: int, repeat: int, tmp_dir: Path) -> list[dict]:
+    bitmaps = bench_util.create_random_bitmaps(size, count)
+    file_paths = [tmp_dir.joinpath(f'{size}-{i}.png') for i in range(count)]
+    params = {'size': size, 'count': count}
+
+    def save_png():
+        for bitmap, file_path in zip(bitmaps, file_paths):
+            bitmap.save_png(file_path)
+
+    def load_png():
+        for file_path in file_paths:
+            MonoBitmap.load_png(file_path)
+
+    return [
+        bench_util.create_result('save_png', bench_util.measure(save_png, repeat), count, **params),
+        bench_util.create_result('load_png', bench_util.measure(load_png, repeat), count, **params),
+    ]
+
+
+def run_kerning_benchmarks(size: int, group_size: int, repeat: int, tmp_dir: Path) -> list[dict]:
+    glyphs_dir = tmp_dir.joinpath(f'kerning-{size}')
+    glyphs_dir.mkdir()
+    alphabet = []
+    for i, bitmap in enumerate(bench_util.create_random_bitmaps(size, group_size)):
+        code_point = 0x4E00 + i
+        bitmap.save_png(glyphs_dir.joinpath(f'{code_point:04X}.png'))
+        alphabet.append(chr(code_point))
+    context = glyph_file_util.load_context(glyphs_dir)
+    kerning_config = KerningConfig({'all': alphabet}, {('all', 'all'): -size // 2})
+    params = {'size': size, 'group_size': group_size}
+
+    for flavor_group in context.values():
+        _ = flavor_group.get_file().bitmap
+
+    seconds = bench_util.measure(lambda: kerning_util.calculate_kerning_values(kerning_config, context), repeat)
+    return [bench_util.create_result('calculate_kerning_values', seconds, group_size * group_size, **params)]
+
+
+def run_fixture_benchmarks(repeat: int) -> list[dict]:
+    file_paths = sorted(file_path for file_path in glyphs_dir.rglob('*.png'))
+    bitmaps = [MonoBitmap.load_png(file_path) for file_path in file_paths]
+
+    def load_png():
+        for file_path in file_paths:
+            MonoBitmap.load_png(file_path)
+
+    def dump_png():
+        for bitmap in bitmaps:
+            bitmap.dump_png(BytesIO())
+
+    return [
+        bench_util.create_result('fixtures.load_png', bench_util.measure(load_png, repeat), len(file_paths)),
+        bench_util.create_result('fixtures.dump_png', bench_util.measure(dump_png, repeat), len(bitmaps)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MonoBitmap operations, PNG I/O and kerning.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 12, 16, 32])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000])
+    parser.add_argument('--kerning-group-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+
+    results = run_fixture_benchmarks(args.repeat)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        for size in args.sizes:
+            for count in args.counts:
+                results.extend(run_bitmap_benchmarks(size, count, args.repeat))
+                png_dir = tmp_dir.joinpath(f'png-{size}-{count}')
+                png_dir.mkdir()
+                results.extend(run_png_benchmarks(size, count, args.repeat, png_dir))
+            results.extend(run_kerning_benchmarks(size, args.kerning_group_size, args.repeat, tmp_dir))
+    bench_util.write_report('mono_bitmap', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
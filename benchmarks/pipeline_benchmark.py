@@ -0,0 +1,156 @@
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import unidata_blocks
+
+import bench_util
+from pixel_font_knife import glyph_file_util, glyph_mapping_util, kerning_util
+from pixel_font_knife.glyph_mapping_util import SourceFlavorGroup, SourceGlyph
+from pixel_font_knife.kerning_util import KerningConfig
+
+
+def get_glyph_file_dir(root_dir: Path, code_point: int) -> Path:
+    code_name = f'{code_point:04X}'
+    block = unidata_blocks.get_block_by_code_point(code_point)
+    file_dir = root_dir.joinpath(f'{block.code_start:04X}-{block.code_end:04X} {block.name}')
+    if block.name == 'CJK Unified Ideographs':
+        file_dir = file_dir.joinpath(f'{code_name[0:-2]}-')
+    return file_dir
+
+
+def create_glyphs_tree(
+        root_dir: Path,
+        count: int,
+        size: int,
+        flavors: list[str],
+        flavor_ratio: float,
+        seed: int = 0,
+) -> list[int]:
+    rng = random.Random(seed)
+    code_points = list(range(0x0021, 0x007F))
+    code_points.extend(range(0x4E00, 0x4E00 + max(0, count - len(code_points))))
+    code_points = code_points[:count]
+
+    bench_util.create_random_bitmap(rng, size).save_png(root_dir.joinpath('notdef.png'))
+    for code_point in code_points:
+        file_dir = get_glyph_file_dir(root_dir, code_point)
+        file_dir.mkdir(parents=True, exist_ok=True)
+        bench_util.create_random_bitmap(rng, size).save_png(file_dir.joinpath(f'{code_point:04X}.png'))
+        if len(flavors) > 0 and rng.random() < flavor_ratio:
+            flavors_str = ','.join(rng.sample(flavors, rng.randint(1, len(flavors))))
+            bench_util.create_random_bitmap(rng, size).save_png(file_dir.joinpath(f'{code_point:04X} {flavors_str}.png'))
+    return code_points
+
+
+def create_mapping(code_points: list[int], flavors: list[str], mapping_ratio: float) -> dict[int, SourceFlavorGroup]:
+    mapping = {}
+    for i, code_point in enumerate(code_points[:int(len(code_points) * mapping_ratio)]):
+        if len(flavors) > 0 and i % 10 == 0:
+            source_group = SourceFlavorGroup({
+                None: SourceGlyph(code_point, None),
+                flavors[0]: SourceGlyph(code_point, flavors[-1]),
+            })
+        else:
+            source_group = SourceFlavorGroup({'*': SourceGlyph(code_point, None)})
+        mapping[0x20000 + i] = source_group
+        if i % 4 == 0:
+            mapping[0x30000 + i] = SourceFlavorGroup({'*': SourceGlyph(0x20000 + i, None)})
+    return mapping
+
+
+class StageRecorder:
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def run(self, name: str, func: Callable[[], Any], items: int) -> Any:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_memory, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+        stage = {
+            'name': name,
+            'items': items,
+            'seconds': seconds,
+        }
+        if self.trace_memory:
+            _, peak_memory = tracemalloc.get_traced_memory()
+            stage['peak_memory_bytes'] = peak_memory - start_memory
+        self.stages.append(stage)
+        return value
+
+
+def run_pipeline(args: argparse.Namespace, count: int, tmp_dir: Path) -> dict[str, Any]:
+    root_dir = tmp_dir.joinpath(f'glyphs-{count}')
+    root_dir.mkdir()
+    flavors = [flavor for flavor in args.flavors.split(',') if flavor != '']
+    code_points = create_glyphs_tree(root_dir, count, args.size, flavors, args.flavor_ratio)
+    mapping_path = tmp_dir.joinpath(f'mapping-{count}.yaml')
+    mapping = create_mapping(code_points, flavors, args.mapping_ratio)
+    glyph_mapping_util.save_mapping(mapping, mapping_path)
+    kerning_config = KerningConfig({'all': [chr(code_point) for code_point in code_points[:args.kerning_group_size]]}, {('all', 'all'): -args.size // 2})
+
+    if args.trace_memory:
+        tracemalloc.start()
+    recorder = StageRecorder(args.trace_memory)
+    total_start = time.perf_counter()
+
+    context = recorder.run('load_context', lambda: glyph_file_util.load_context(root_dir), count)
+    glyph_files = {glyph_file for flavor_group in context.values() for glyph_file in flavor_group.values()}
+    recorder.run('load_bitmaps', lambda: [glyph_file.bitmap for glyph_file in glyph_files], len(glyph_files))
+    recorder.run('normalize_context', lambda: glyph_file_util.normalize_context(context, root_dir, flavors), len(glyph_files))
+    mapping = recorder.run('load_mapping', lambda: glyph_mapping_util.load_mapping(mapping_path), len(mapping))
+    mapped_context = dict(context)
+    recorder.run('apply_mapping', lambda: glyph_mapping_util.apply_mapping(mapped_context, mapping, transitive=True), len(mapping))
+    recorder.run('get_glyph_sequence', lambda: glyph_file_util.get_glyph_sequence(mapped_context, [None, *flavors]), len(mapped_context))
+    recorder.run('get_character_mapping', lambda: [glyph_file_util.get_character_mapping(mapped_context, flavor) for flavor in [None, *flavors]], len(mapped_context) * (len(flavors) + 1))
+    recorder.run('calculate_kerning_values', lambda: kerning_util.calculate_flavors_kerning_values(kerning_config, mapped_context, [None, *flavors]), args.kerning_group_size ** 2)
+
+    total_seconds = time.perf_counter() - total_start
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    return {
+        'name': 'pipeline',
+        'params': {
+            'count': count,
+            'size': args.size,
+            'flavors': flavors,
+            'flavor_ratio': args.flavor_ratio,
+            'mapping_ratio': args.mapping_ratio,
+            'kerning_group_size': args.kerning_group_size,
+        },
+        'seconds': total_seconds,
+        'stages': recorder.stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the glyph pipeline end to end over synthetic glyph trees.')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--size', type=int, default=12)
+    parser.add_argument('--flavors', default='zh_cn,zh_hk,zh_tw,zh_tr,ko,ja')
+    parser.add_argument('--flavor-ratio', type=float, default=0.1)
+    parser.add_argument('--mapping-ratio', type=float, default=0.2)
+    parser.add_argument('--kerning-group-size', type=int, default=64)
+    parser.add_argument('--trace-memory', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.counts:
+            results.append(run_pipeline(args, count, Path(tmp_dir)))
+    bench_util.write_report('pipeline', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
+from typing import Any, ClassVar
+
+
+class FlavorTable:
+    __slots__ = ('_keys', '_splits')
+
+    _keys: dict[str, str]
+    _splits: dict[str, tuple[str, ...]]
+
+    def __init__(self):
+        self._keys = {}
+        self._splits = {}
+
+    def __contains__(self, flavor: object) -> bool:
+        return flavor in self._keys
+
+    def lookup(self, flavor: str) -> str:
+        key = self._keys.get(flavor)
+        if key is None:
+            key = flavor.lower()
+        return key
+
+    def normalize(self, flavor: str) -> str:
+        key = self._keys.get(flavor)
+        if key is None:
+            key = sys.intern(flavor.lower())
+            self._keys[flavor] = key
+        return key
+
+    def split(self, flavors: str) -> tuple[str, ...]:
+        keys = self._splits.get(flavors)
+        if keys is None:
+            keys = tuple(self.normalize(flavor) for flavor in flavors.split(','))
+            self._splits[flavors] = keys
+        return keys
+
+
+flavor_table = FlavorTable()
+
+
+def normalize_flavor(flavor: str) -> str:
+    return flavor_table.normalize(flavor)
+
+
+def lookup_flavor(flavor: str) -> str:
+    return flavor_table.lookup(flavor)
+
+
+class FlavorGroup[T](MutableMapping[str | None, T]):
+    @classmethod
+    def fromkeys(cls, iterable: Iterable[Any], value: Any = None) -> FlavorGroup[T]:
+        group = cls()
+        for flavor in iterable:
+            group[flavor] = value
+        return group
+
+    value_type: ClassVar[type]
+    missing_message: ClassVar[str] = 'no flavor value'
+
+    __slots__ = ('_data', '_shared')
+
+    _data: dict[str | None, T]
+    _shared: bool
+
+    def __init__(self, other: Mapping[Any, Any] | Iterable[tuple[Any, Any]] | None = None, /, **kwargs: Any):
+        self._data = {}
+        self._shared = False
+        if other is not None:
+            self.update(other)
+        if len(kwargs) > 0:
+            self.update(kwargs)
+
+    def __getitem__(self, flavor: Any) -> T:
+        if isinstance(flavor, str):
+            flavor = lookup_flavor(flavor)
+        return self._data[flavor]
+
+    def __setitem__(self, flavor: Any, value: Any):
+        if value is None:
+            self.pop(flavor, None)
+            return
+
+        if isinstance(flavor, str):
+            flavor = normalize_flavor(flavor)
+        elif flavor is not None:
+            raise KeyError(f"illegal flavor type: '{type(flavor).__name__}'")
+
+        if not isinstance(value, self.value_type):
+            raise ValueError(f"illegal value type: '{type(value).__name__}'")
+
+        if self._shared:
+            self._unshare()
+        self._data[flavor] = value
+
+    def __delitem__(self, flavor: Any):
+        if isinstance(flavor, str):
+            flavor = lookup_flavor(flavor)
+        if self._shared:
+            self._unshare()
+        del self._data[flavor]
+
+    def __contains__(self, flavor: Any) -> bool:
+        if isinstance(flavor, str):
+            flavor = lookup_flavor(flavor)
+        return flavor in self._data
+
+    def __iter__(self) -> Iterator[str | None]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FlavorGroup):
+            return self._data == other._data
+        if isinstance(other, Mapping):
+            return self._data == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self._data!r})'
+
+    def __copy__(self) -> FlavorGroup[T]:
+        return self.copy()
+
+    def __or__(self, other: Any) -> FlavorGroup[T]:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        group = self.copy()
+        group.update(other)
+        return group
+
+    def __ror__(self, other: Any) -> FlavorGroup[T]:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        group = type(self)(other)
+        group.update(self)
+        return group
+
+    def __ior__(self, other: Any) -> FlavorGroup[T]:
+        self.update(other)
+        return self
+
+    @property
+    def data(self) -> dict[str | None, T]:
+        if self._shared:
+            self._unshare()
+        return self._data
+
+    def get(self, flavor: Any, default: Any = None) -> Any:
+        if isinstance(flavor, str):
+            flavor = lookup_flavor(flavor)
+        return self._data.get(flavor, default)
+
+    def pop(self, flavor: Any, *args: Any) -> Any:
+        if isinstance(flavor, str):
+            flavor = lookup_flavor(flavor)
+        if self._shared:
+            self._unshare()
+        return self._data.pop(flavor, *args)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    def clear(self):
+        self._data = {}
+        self._shared = False
+
+    def update(self, other: Any = (), /, **kwargs: Any):
+        if type(other) is type(self):
+            if self._shared:
+                self._unshare()
+            self._data.update(other._data)
+        else:
+            super().update(other)
+        if len(kwargs) > 0:
+            super().update(kwargs)
+
+    def _unshare(self):
+        self._data = self._data.copy()
+        self._shared = False
+
+    def copy(self) -> FlavorGroup[T]:
+        group = type(self)()
+        group._data = self._data
+        group._shared = True
+        self._shared = True
+        return group
+
+    def resolve(self, flavor: str | None = None) -> T:
+        data = self._data
+        if flavor is not None:
+            value = data.get(lookup_flavor(flavor) if isinstance(flavor, str) else flavor)
+            if value is not None:
+                return value
+        value = data.get(None)
+        if value is None:
+            raise KeyError(f'{self.missing_message}: {flavor!r}')
+        return value
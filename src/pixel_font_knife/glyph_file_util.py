@@ -1,15 +1,13 @@
 from __future__ import annotations
 
 import shutil
-from collections import UserDict
 from os import PathLike
 from pathlib import Path
-from typing import Any
 
-import unidata_blocks
-
-from pixel_font_knife import fs_util
+from pixel_font_knife import fs_util, instrument_util
+from pixel_font_knife.flavor_util import FlavorGroup, flavor_table
 from pixel_font_knife.mono_bitmap import MonoBitmap
+from pixel_font_knife.progress_util import CancelToken, ProgressCallback
 
 
 class GlyphFile:
@@ -30,14 +28,18 @@ class GlyphFile:
         code_point = int(parts[0], 16)
         flavors = []
         if len(parts) > 1:
-            for flavor in parts[1].lower().split(','):
+            for flavor in flavor_table.split(parts[1]):
                 if flavor not in flavors:
                     flavors.append(flavor)
         return GlyphFile(file_path, code_point, flavors)
 
+    __slots__ = ('file_path', '_code_point', '_flavors', '_glyph_name', '_glyph_name_flavor', '_bitmap')
+
     file_path: Path
-    code_point: int
-    flavors: list[str]
+    _code_point: int
+    _flavors: list[str]
+    _glyph_name: str | None
+    _glyph_name_flavor: str | None
     _bitmap: MonoBitmap | None
 
     def __init__(
@@ -47,14 +49,39 @@ class GlyphFile:
             flavors: list[str],
     ):
         self.file_path = file_path
-        self.code_point = code_point
-        self.flavors = flavors
+        self._code_point = code_point
+        self._flavors = flavors
+        self._glyph_name = None
+        self._glyph_name_flavor = None
         self._bitmap = None
 
+    @property
+    def code_point(self) -> int:
+        return self._code_point
+
+    @code_point.setter
+    def code_point(self, code_point: int):
+        self._code_point = code_point
+        self._glyph_name = None
+
+    @property
+    def flavors(self) -> list[str]:
+        return self._flavors
+
+    @flavors.setter
+    def flavors(self, flavors: list[str]):
+        self._flavors = flavors
+        self._glyph_name = None
+
     @property
     def bitmap(self) -> MonoBitmap:
+        instrument = instrument_util.get_instrument()
         if self._bitmap is None:
             self._bitmap = MonoBitmap.load_png(self.file_path)
+            if instrument is not None:
+                instrument.add_cache_misses('glyph_file.bitmap')
+        elif instrument is not None:
+            instrument.add_cache_hits('glyph_file.bitmap')
         return self._bitmap
 
     @property
@@ -67,57 +94,32 @@ class GlyphFile:
 
     @property
     def glyph_name(self) -> str:
-        if self.code_point == -1:
-            return '.notdef'
-
-        name = f'u{self.code_point:04X}'
-        if len(self.flavors) > 0:
-            name = f'{name}-{self.flavors[0].upper()}'
-        return name
+        flavor = self._flavors[0] if len(self._flavors) > 0 else None
+        if self._glyph_name is None or self._glyph_name_flavor is not flavor:
+            if self._code_point == -1:
+                name = '.notdef'
+            else:
+                name = f'u{self._code_point:04X}'
+                if flavor is not None:
+                    name = f'{name}-{flavor.upper()}'
+            self._glyph_name = name
+            self._glyph_name_flavor = flavor
+        return self._glyph_name
 
     def save(self):
         self.bitmap.save_png(self.file_path)
 
 
-class GlyphFlavorGroup(UserDict[str | None, GlyphFile]):
-    def __getitem__(self, flavor: Any) -> GlyphFile:
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        return super().__getitem__(flavor)
-
-    def __setitem__(self, flavor: Any, glyph_file: Any):
-        if glyph_file is None:
-            self.pop(flavor, None)
-            return
-
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        elif flavor is not None:
-            raise KeyError(f"illegal flavor type: '{type(flavor).__name__}'")
-
-        if not isinstance(glyph_file, GlyphFile):
-            raise ValueError(f"illegal value type: '{type(glyph_file).__name__}'")
-
-        super().__setitem__(flavor, glyph_file)
+class GlyphFlavorGroup(FlavorGroup[GlyphFile]):
+    value_type = GlyphFile
+    missing_message = 'no flavor file'
 
-    def __delitem__(self, flavor: Any):
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        super().__delitem__(flavor)
+    __slots__ = ()
 
-    def __contains__(self, flavor: Any) -> bool:
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        return super().__contains__(flavor)
-
-    def get_file(self, flavor: str | None = None) -> GlyphFile:
-        if flavor in self:
-            return self[flavor]
-        if None in self:
-            return self[None]
-        raise KeyError(f'no flavor file: {flavor!r}')
+    get_file = FlavorGroup.resolve
 
 
+@instrument_util.timed('load_context')
 def load_context(root_dir: str | PathLike[str]) -> dict[int, GlyphFlavorGroup]:
     if isinstance(root_dir, str):
         root_dir = Path(root_dir)
@@ -146,18 +148,61 @@ def load_context(root_dir: str | PathLike[str]) -> dict[int, GlyphFlavorGroup]:
                 if None in flavor_group:
                     raise RuntimeError(f"default flavor already exists:\n'{glyph_file.file_path}'\n'{flavor_group[None].file_path}'")
                 flavor_group[None] = glyph_file
+
+    instrument = instrument_util.get_instrument()
+    if instrument is not None:
+        instrument.add_items('load_context', len(context))
     return context
 
 
+def load_bitmaps(
+        context: dict[int, GlyphFlavorGroup],
+        progress: ProgressCallback | None = None,
+        cancel_token: CancelToken | None = None,
+):
+    glyph_files = list(dict.fromkeys(glyph_file for flavor_group in context.values() for glyph_file in flavor_group.values()))
+    total = len(glyph_files)
+    for done, glyph_file in enumerate(glyph_files, 1):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        glyph_file.bitmap
+        if progress is not None:
+            progress(done, total)
+
+
+@instrument_util.timed('normalize_context')
 def normalize_context(
         context: dict[int, GlyphFlavorGroup],
         root_dir: str | PathLike[str],
         flavors_order: list[str] | None = None,
+        progress: ProgressCallback | None = None,
+        cancel_token: CancelToken | None = None,
 ):
     if isinstance(root_dir, str):
         root_dir = Path(root_dir)
 
-    for code_point, flavor_group in context.items():
+    try:
+        _normalize_glyph_files(context, root_dir, flavors_order, progress, cancel_token)
+    finally:
+        for file_dir, _, _ in root_dir.walk(top_down=False):
+            if fs_util.is_empty_dir(file_dir):
+                shutil.rmtree(file_dir)
+
+
+def _normalize_glyph_files(
+        context: dict[int, GlyphFlavorGroup],
+        root_dir: Path,
+        flavors_order: list[str] | None,
+        progress: ProgressCallback | None,
+        cancel_token: CancelToken | None,
+):
+    import unidata_blocks
+
+    total = len(context)
+    for done, (code_point, flavor_group) in enumerate(context.items(), 1):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
         if code_point == -1:
             code_name = 'notdef'
             file_dir = root_dir
@@ -187,9 +232,12 @@ def normalize_context(
 
             glyph_file.save()
 
-    for file_dir, _, _ in root_dir.walk(top_down=False):
-        if fs_util.is_empty_dir(file_dir):
-            shutil.rmtree(file_dir)
+        if progress is not None:
+            progress(done, total)
+
+    instrument = instrument_util.get_instrument()
+    if instrument is not None:
+        instrument.add_items('normalize_context', total)
 
 
 def get_glyph_sequence(
@@ -1,15 +1,20 @@
-from collections import UserDict
-from io import StringIO
+from __future__ import annotations
+
+import os
+import struct
+from collections.abc import Callable, Iterable
 from os import PathLike
 from pathlib import Path
-from typing import Any
-
-import yaml
+from typing import BinaryIO, TextIO
 
+from pixel_font_knife import instrument_util, yaml_util
+from pixel_font_knife.flavor_util import FlavorGroup, flavor_table, lookup_flavor
 from pixel_font_knife.glyph_file_util import GlyphFlavorGroup
 
 
 class SourceGlyph:
+    __slots__ = ('code_point', 'flavor')
+
     code_point: int
     flavor: str | None
 
@@ -18,44 +23,113 @@ class SourceGlyph:
         self.flavor = flavor
 
 
-class SourceFlavorGroup(UserDict[str | None, SourceGlyph]):
-    def __getitem__(self, flavor: Any) -> SourceGlyph:
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        return super().__getitem__(flavor)
+class SourceFlavorGroup(FlavorGroup[SourceGlyph]):
+    value_type = SourceGlyph
+
+    __slots__ = ()
+
+
+class MappingIndex:
+    @staticmethod
+    def build(mapping: dict[int, SourceFlavorGroup]) -> MappingIndex:
+        index = MappingIndex()
+        for code_point, source_group in mapping.items():
+            index.update(code_point, source_group)
+        return index
 
-    def __setitem__(self, flavor: Any, source_glyph: Any):
-        if source_glyph is None:
-            self.pop(flavor, None)
+    __slots__ = ('_dependents', '_sources')
+
+    _dependents: dict[int, dict[str | None, set[tuple[int, str | None]]]]
+    _sources: dict[int, list[tuple[int, str | None, str | None]]]
+
+    def __init__(self):
+        self._dependents = {}
+        self._sources = {}
+
+    def __contains__(self, code_point: object) -> bool:
+        return code_point in self._dependents
+
+    def update(self, code_point: int, source_group: SourceFlavorGroup | None):
+        self.remove(code_point)
+        if source_group is None or len(source_group) == 0:
             return
 
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        elif flavor is not None:
-            raise KeyError(f"illegal flavor type: '{type(flavor).__name__}'")
+        sources = []
+        for flavor, source_glyph in source_group.items():
+            source_flavor = '*' if flavor == '*' else source_glyph.flavor
+            sources.append((source_glyph.code_point, source_flavor, flavor))
+            self._dependents.setdefault(source_glyph.code_point, {}).setdefault(source_flavor, set()).add((code_point, flavor))
+        self._sources[code_point] = sources
 
-        if not isinstance(source_glyph, SourceGlyph):
-            raise ValueError(f"illegal value type: '{type(source_glyph).__name__}'")
+    def remove(self, code_point: int):
+        sources = self._sources.pop(code_point, None)
+        if sources is None:
+            return
 
-        super().__setitem__(flavor, source_glyph)
+        for source_code_point, source_flavor, flavor in sources:
+            flavor_dependents = self._dependents[source_code_point]
+            dependents = flavor_dependents[source_flavor]
+            dependents.discard((code_point, flavor))
+            if len(dependents) == 0:
+                del flavor_dependents[source_flavor]
+                if len(flavor_dependents) == 0:
+                    del self._dependents[source_code_point]
+
+    def get_dependents(
+            self,
+            code_point: int,
+            flavor: str | None = None,
+            source_context: dict[int, GlyphFlavorGroup] | None = None,
+    ) -> set[tuple[int, str | None]]:
+        flavor_dependents = self._dependents.get(code_point)
+        if flavor_dependents is None:
+            return set()
 
-    def __delitem__(self, flavor: Any):
         if isinstance(flavor, str):
-            flavor = flavor.lower()
-        super().__delitem__(flavor)
+            flavor = lookup_flavor(flavor)
+        dependents = set(flavor_dependents.get(flavor, ()))
+        dependents.update(flavor_dependents.get('*', ()))
+        if flavor is None:
+            source_group = None if source_context is None else source_context.get(code_point)
+            for source_flavor, fallback_dependents in flavor_dependents.items():
+                if source_flavor is None or source_flavor == '*':
+                    continue
+                if source_group is None or source_flavor not in source_group:
+                    dependents.update(fallback_dependents)
+        return dependents
 
-    def __contains__(self, flavor: Any) -> bool:
-        if isinstance(flavor, str):
-            flavor = flavor.lower()
-        return super().__contains__(flavor)
+    def get_dependent_code_points(self, code_point: int) -> set[int]:
+        code_points = set()
+        for dependents in self._dependents.get(code_point, {}).values():
+            for dependent_code_point, _ in dependents:
+                code_points.add(dependent_code_point)
+        return code_points
 
 
-def load_mapping(file_path: str | PathLike[str]) -> dict[int, SourceFlavorGroup]:
-    if isinstance(file_path, str):
-        file_path = Path(file_path)
+class MappingDiagnostic:
+    __slots__ = ('kind', 'code_point', 'flavor', 'message')
+
+    kind: str
+    code_point: int
+    flavor: str | None
+    message: str
+
+    def __init__(self, kind: str, code_point: int, flavor: str | None, message: str):
+        self.kind = kind
+        self.code_point = code_point
+        self.flavor = flavor
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f'MappingDiagnostic({self.kind!r}, 0x{self.code_point:04X}, {self.flavor!r}, {self.message!r})'
+
 
+def load_mapping(
+        file_path: str | PathLike[str],
+        cache_dir: str | PathLike[str] | None = None,
+) -> dict[int, SourceFlavorGroup]:
     mapping = {}
-    raw_mapping = yaml.safe_load(file_path.read_bytes())
+    raw_mapping = yaml_util.load_yaml(file_path, cache_dir)
     if raw_mapping is not None:
         for code_point, raw_source_group in raw_mapping.items():
             if raw_source_group is not None:
@@ -74,13 +148,13 @@ def load_mapping(file_path: str | PathLike[str]) -> dict[int, SourceFlavorGroup]
                         if key is None:
                             flavors = []
                         else:
-                            flavors = key.lower().split(',')
+                            flavors = flavor_table.split(key)
 
                         if isinstance(value, int):
                             source_glyph = SourceGlyph(value, None)
                         else:
                             parts = value.split(maxsplit=1)
-                            source_glyph = SourceGlyph(int(parts[0], 0), parts[1].lower())
+                            source_glyph = SourceGlyph(int(parts[0], 0), flavor_table.normalize(parts[1]))
 
                         if len(flavors) > 0:
                             for flavor in flavors:
@@ -95,21 +169,20 @@ def load_mapping(file_path: str | PathLike[str]) -> dict[int, SourceFlavorGroup]
     return mapping
 
 
-def save_mapping(
+def dump_mapping(
         mapping: dict[int, SourceFlavorGroup],
-        file_path: str | PathLike[str],
+        stream: TextIO,
         flavors_order: list[str] | None = None,
 ):
-    buffer = StringIO()
-
-    for code_point, source_group in sorted(mapping.items()):
-        buffer.write('\n')
+    for code_point in sorted(mapping):
+        source_group = mapping[code_point]
+        stream.write('\n')
         c = chr(code_point)
         if c.isprintable():
-            buffer.write(f'# {c}\n')
+            stream.write(f'# {c}\n')
         else:
-            buffer.write(f'# 0x{code_point:04X}\n')
-        buffer.write(f'0x{code_point:04X}:\n')
+            stream.write(f'# 0x{code_point:04X}\n')
+        stream.write(f'0x{code_point:04X}:\n')
 
         if '*' in source_group:
             if len(source_group) > 1:
@@ -124,8 +197,8 @@ def save_mapping(
                 source_c = f'0x{source_glyph.code_point:04X}'
             source_str = f'0x{source_glyph.code_point:04X}'
 
-            buffer.write(f'  # {source_c}\n')
-            buffer.write(f'  "*": {source_str}\n')
+            stream.write(f'  # {source_c}\n')
+            stream.write(f'  "*": {source_str}\n')
         else:
             source_pending = {}
             for flavor, source_glyph in source_group.items():
@@ -163,52 +236,355 @@ def save_mapping(
 
             if default_source is not None:
                 default_source_str, default_source_c = default_source
-                buffer.write(f'  # {default_source_c}\n')
-                buffer.write(f'  ~: {default_source_str}\n')
+                stream.write(f'  # {default_source_c}\n')
+                stream.write(f'  ~: {default_source_str}\n')
             for _, flavors_str, (source_str, source_c) in flavor_pending:
-                buffer.write(f'  # {source_c}\n')
-                buffer.write(f'  {flavors_str}: {source_str}\n')
+                stream.write(f'  # {source_c}\n')
+                stream.write(f'  {flavors_str}: {source_str}\n')
+
 
+def save_mapping(
+        mapping: dict[int, SourceFlavorGroup],
+        file_path: str | PathLike[str],
+        flavors_order: list[str] | None = None,
+):
     if isinstance(file_path, str):
         file_path = Path(file_path)
-    file_path.write_text(buffer.getvalue(), 'utf-8')
+    temp_path = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+    try:
+        with temp_path.open('w', encoding='utf-8') as file:
+            dump_mapping(mapping, file, flavors_order)
+        temp_path.replace(file_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+_COMPILED_MAPPING_MAGIC = b'PFKM'
+_COMPILED_MAPPING_VERSION = 1
+
+
+def dump_compiled_mapping(mapping: dict[int, SourceFlavorGroup], stream: BinaryIO):
+    flavor_ids = {}
+    flavor_names = []
+    records = []
+    for code_point, source_group in mapping.items():
+        records.append(code_point)
+        records.append(len(source_group))
+        for flavor, source_glyph in source_group.items():
+            for name in (flavor, source_glyph.flavor):
+                if name is None:
+                    records.append(-1)
+                    continue
+                flavor_id = flavor_ids.get(name)
+                if flavor_id is None:
+                    flavor_id = len(flavor_names)
+                    flavor_ids[name] = flavor_id
+                    flavor_names.append(name)
+                records.append(flavor_id)
+            records.append(source_glyph.code_point)
+
+    stream.write(struct.pack('<4sII', _COMPILED_MAPPING_MAGIC, _COMPILED_MAPPING_VERSION, len(flavor_names)))
+    for name in flavor_names:
+        name_bytes = name.encode('utf-8')
+        stream.write(struct.pack('<H', len(name_bytes)))
+        stream.write(name_bytes)
+    stream.write(struct.pack(f'<I{len(records)}i', len(records), *records))
+
+
+def save_compiled_mapping(mapping: dict[int, SourceFlavorGroup], file_path: str | PathLike[str]):
+    if isinstance(file_path, str):
+        file_path = Path(file_path)
+    temp_path = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+    try:
+        with temp_path.open('wb') as file:
+            dump_compiled_mapping(mapping, file)
+        temp_path.replace(file_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def load_compiled_mapping(file_path: str | PathLike[str]) -> dict[int, SourceFlavorGroup]:
+    if isinstance(file_path, str):
+        file_path = Path(file_path)
+    data = file_path.read_bytes()
+
+    try:
+        magic, version, flavors_count = struct.unpack_from('<4sII', data)
+        if magic != _COMPILED_MAPPING_MAGIC:
+            raise ValueError(f"not compiled mapping file: '{file_path}'")
+        if version != _COMPILED_MAPPING_VERSION:
+            raise ValueError(f"unsupported compiled mapping version {version}: '{file_path}'")
+        offset = struct.calcsize('<4sII')
+
+        flavor_names = []
+        for _ in range(flavors_count):
+            name_length, = struct.unpack_from('<H', data, offset)
+            offset += 2
+            flavor_names.append(flavor_table.normalize(data[offset:offset + name_length].decode('utf-8')))
+            offset += name_length
+
+        records_count, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        if len(data) - offset != records_count * 4:
+            raise ValueError(f"not compiled mapping file: '{file_path}'")
+        records = struct.unpack_from(f'<{records_count}i', data, offset)
+
+        mapping = {}
+        position = 0
+        while position < len(records):
+            code_point = records[position]
+            entries_count = records[position + 1]
+            position += 2
+            if entries_count < 0 or position + entries_count * 3 > len(records):
+                raise ValueError(f"not compiled mapping file: '{file_path}'")
+            source_group = SourceFlavorGroup()
+            for _ in range(entries_count):
+                flavor_id, source_flavor_id, source_code_point = records[position:position + 3]
+                position += 3
+                if not -1 <= flavor_id < len(flavor_names) or not -1 <= source_flavor_id < len(flavor_names):
+                    raise ValueError(f"not compiled mapping file: '{file_path}'")
+                flavor = None if flavor_id == -1 else flavor_names[flavor_id]
+                source_flavor = None if source_flavor_id == -1 else flavor_names[source_flavor_id]
+                source_group[flavor] = SourceGlyph(source_code_point, source_flavor)
+            mapping[code_point] = source_group
+    except (struct.error, IndexError, UnicodeDecodeError):
+        raise ValueError(f"not compiled mapping file: '{file_path}'") from None
+    return mapping
+
+
+def compile_mapping(file_path: str | PathLike[str], output_path: str | PathLike[str]):
+    save_compiled_mapping(load_mapping(file_path), output_path)
+
+
+def _create_flavor_group_patch(
+        code_point: int,
+        source_group: SourceFlavorGroup,
+        get_source_flavor_group: Callable[[int], GlyphFlavorGroup | None],
+) -> GlyphFlavorGroup | None:
+    if len(source_group) == 0:
+        return None
+
+    if '*' in source_group:
+        if len(source_group) > 1:
+            raise RuntimeError(f'0x{code_point:04X} wildcard flavor cannot be mixed with explicit flavors')
+
+        source_glyph = source_group['*']
+        if source_glyph.flavor is not None:
+            raise RuntimeError(f'0x{code_point:04X} wildcard flavor source must be a code point')
+
+        source_flavor_group = get_source_flavor_group(source_glyph.code_point)
+        if source_flavor_group is None:
+            return None
+        return source_flavor_group.copy()
+    else:
+        flavor_group = None
+        for flavor, source_glyph in source_group.items():
+            source_flavor_group = get_source_flavor_group(source_glyph.code_point)
+            if source_flavor_group is None:
+                continue
+            if flavor_group is None:
+                flavor_group = GlyphFlavorGroup()
+            flavor_group[flavor] = source_flavor_group.get_file(source_glyph.flavor)
+        return flavor_group
+
+
+def _resolve_mapping(
+        mapping: dict[int, SourceFlavorGroup],
+        code_points: Iterable[int],
+        get_base_flavor_group: Callable[[int], GlyphFlavorGroup | None],
+) -> dict[int, GlyphFlavorGroup | None]:
+    if not isinstance(code_points, (set, dict)):
+        code_points = set(code_points)
+    resolved = {}
+
+    def get_source_flavor_group(source_code_point: int) -> GlyphFlavorGroup | None:
+        flavor_group = resolved.get(source_code_point)
+        if flavor_group is None:
+            flavor_group = get_base_flavor_group(source_code_point)
+        return flavor_group
+
+    for code_point in code_points:
+        if code_point in resolved:
+            continue
+
+        stack = [code_point]
+        visiting = {code_point}
+        while len(stack) > 0:
+            current_code_point = stack[-1]
+            source_group = mapping[current_code_point]
+
+            pending_code_point = None
+            for source_glyph in source_group.values():
+                source_code_point = source_glyph.code_point
+                if source_code_point == current_code_point or source_code_point in resolved or source_code_point not in code_points:
+                    continue
+                if source_code_point in visiting:
+                    cycle = stack[stack.index(source_code_point):] + [source_code_point]
+                    raise RuntimeError(f"circular mapping: {' -> '.join(f'0x{c:04X}' for c in cycle)}")
+                pending_code_point = source_code_point
+                break
+
+            if pending_code_point is not None:
+                stack.append(pending_code_point)
+                visiting.add(pending_code_point)
+                continue
+
+            flavor_group = _create_flavor_group_patch(current_code_point, source_group, get_source_flavor_group)
+            if flavor_group is not None:
+                base_flavor_group = get_base_flavor_group(current_code_point)
+                if base_flavor_group is not None:
+                    patch = flavor_group
+                    flavor_group = base_flavor_group.copy()
+                    flavor_group.update(patch)
+            resolved[current_code_point] = flavor_group
+            stack.pop()
+            visiting.remove(current_code_point)
+
+    return resolved
+
+
+def resolve_mapping(
+        context: dict[int, GlyphFlavorGroup],
+        mapping: dict[int, SourceFlavorGroup],
+) -> dict[int, GlyphFlavorGroup]:
+    resolved = _resolve_mapping(mapping, mapping, context.get)
+    return {code_point: flavor_group for code_point, flavor_group in resolved.items() if flavor_group is not None}
 
 
+@instrument_util.timed('apply_mapping')
 def apply_mapping(
         context: dict[int, GlyphFlavorGroup],
         mapping: dict[int, SourceFlavorGroup],
+        transitive: bool = False,
 ):
-    context_patch = {}
-    for code_point, source_group in mapping.items():
-        if len(source_group) == 0:
-            continue
-
-        if '*' in source_group:
-            if len(source_group) > 1:
-                raise RuntimeError(f'0x{code_point:04X} wildcard flavor cannot be mixed with explicit flavors')
+    instrument = instrument_util.get_instrument()
+    if instrument is not None:
+        instrument.add_items('apply_mapping', len(mapping))
 
-            source_glyph = source_group['*']
-            if source_glyph.flavor is not None:
-                raise RuntimeError(f'0x{code_point:04X} wildcard flavor source must be a code point')
+    if transitive:
+        context.update(resolve_mapping(context, mapping))
+        return
 
-            if source_glyph.code_point not in context:
-                continue
-            flavor_group = GlyphFlavorGroup()
+    context_patch = {}
+    for code_point, source_group in mapping.items():
+        flavor_group = _create_flavor_group_patch(code_point, source_group, context.get)
+        if flavor_group is not None:
             context_patch[code_point] = flavor_group
-            for flavor, glyph_file in context[source_glyph.code_point].items():
-                flavor_group[flavor] = glyph_file
-        else:
-            flavor_group = None
-            for flavor, source_glyph in source_group.items():
-                if source_glyph.code_point not in context:
-                    continue
-                if flavor_group is None:
-                    flavor_group = GlyphFlavorGroup()
-                    context_patch[code_point] = flavor_group
-                flavor_group[flavor] = context[source_glyph.code_point].get_file(source_glyph.flavor)
 
     for code_point, flavor_group in context_patch.items():
         if code_point in context:
             context[code_point].update(flavor_group)
         else:
             context[code_point] = flavor_group
+
+
+def reapply_mapping(
+        context: dict[int, GlyphFlavorGroup],
+        source_context: dict[int, GlyphFlavorGroup],
+        mapping: dict[int, SourceFlavorGroup],
+        code_points: Iterable[int],
+        mapping_index: MappingIndex | None = None,
+) -> set[int]:
+    if mapping_index is None:
+        mapping_index = MappingIndex.build(mapping)
+
+    affected_code_points = set(code_points)
+    pending_code_points = list(affected_code_points)
+    while len(pending_code_points) > 0:
+        for dependent_code_point in mapping_index.get_dependent_code_points(pending_code_points.pop()):
+            if dependent_code_point not in affected_code_points:
+                affected_code_points.add(dependent_code_point)
+                pending_code_points.append(dependent_code_point)
+
+    def get_base_flavor_group(code_point: int) -> GlyphFlavorGroup | None:
+        if code_point in affected_code_points:
+            return source_context.get(code_point)
+        return context.get(code_point)
+
+    resolved = _resolve_mapping(
+        mapping,
+        {code_point for code_point in affected_code_points if code_point in mapping},
+        get_base_flavor_group,
+    )
+
+    for code_point in affected_code_points:
+        flavor_group = resolved.get(code_point)
+        if flavor_group is None:
+            flavor_group = source_context.get(code_point)
+            if flavor_group is not None:
+                flavor_group = flavor_group.copy()
+        if flavor_group is None:
+            context.pop(code_point, None)
+        else:
+            context[code_point] = flavor_group
+    return affected_code_points
+
+
+def validate_mapping(
+        mapping: dict[int, SourceFlavorGroup],
+        context: dict[int, GlyphFlavorGroup],
+        transitive: bool = False,
+) -> list[MappingDiagnostic]:
+    diagnostics = []
+
+    for code_point, source_group in mapping.items():
+        if '*' in source_group:
+            if len(source_group) > 1:
+                diagnostics.append(MappingDiagnostic('wildcard-mixed', code_point, '*', f'0x{code_point:04X} wildcard flavor cannot be mixed with explicit flavors'))
+            if source_group['*'].flavor is not None:
+                diagnostics.append(MappingDiagnostic('wildcard-source-flavor', code_point, '*', f'0x{code_point:04X} wildcard flavor source must be a code point'))
+
+        flavor_group = context.get(code_point)
+        for flavor, source_glyph in source_group.items():
+            if flavor_group is not None:
+                if flavor == '*':
+                    shadowed = len(flavor_group) > 0
+                else:
+                    shadowed = flavor in flavor_group
+                if shadowed:
+                    diagnostics.append(MappingDiagnostic('shadowed', code_point, flavor, f'0x{code_point:04X} flavor {flavor!r} shadows an existing glyph file'))
+
+            source_code_point = source_glyph.code_point
+            if transitive and source_code_point in mapping and source_code_point != code_point:
+                continue
+            source_flavor_group = context.get(source_code_point)
+            if source_flavor_group is None:
+                diagnostics.append(MappingDiagnostic('missing-source', code_point, flavor, f'0x{code_point:04X} flavor {flavor!r} source 0x{source_code_point:04X} not found'))
+            elif flavor != '*' and source_glyph.flavor not in source_flavor_group:
+                if source_glyph.flavor is None:
+                    message = f'0x{code_point:04X} flavor {flavor!r} source 0x{source_code_point:04X} has no default flavor'
+                elif None in source_flavor_group:
+                    message = f'0x{code_point:04X} flavor {flavor!r} source 0x{source_code_point:04X} has no flavor {source_glyph.flavor!r}, falls back to default flavor'
+                else:
+                    message = f'0x{code_point:04X} flavor {flavor!r} source 0x{source_code_point:04X} has no flavor {source_glyph.flavor!r} and no default flavor'
+                diagnostics.append(MappingDiagnostic('missing-source-flavor', code_point, flavor, message))
+
+    if not transitive:
+        return diagnostics
+
+    states = {}
+    for code_point in mapping:
+        if code_point in states:
+            continue
+        states[code_point] = False
+        stack = [(code_point, iter(mapping[code_point].values()))]
+        while len(stack) > 0:
+            current_code_point, source_glyphs = stack[-1]
+            for source_glyph in source_glyphs:
+                source_code_point = source_glyph.code_point
+                if source_code_point == current_code_point or source_code_point not in mapping:
+                    continue
+                state = states.get(source_code_point)
+                if state is None:
+                    states[source_code_point] = False
+                    stack.append((source_code_point, iter(mapping[source_code_point].values())))
+                    break
+                if not state:
+                    cycle = [c for c, _ in stack]
+                    cycle = cycle[cycle.index(source_code_point):] + [source_code_point]
+                    diagnostics.append(MappingDiagnostic('circular', source_code_point, None, f"circular mapping: {' -> '.join(f'0x{c:04X}' for c in cycle)}"))
+            else:
+                states[current_code_point] = True
+                stack.pop()
+
+    return diagnostics
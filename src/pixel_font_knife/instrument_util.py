@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import functools
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+
+class StageStats:
+    __slots__ = ('calls', 'items', 'seconds', 'bytes_read', 'bytes_written', 'cache_hits', 'cache_misses')
+
+    calls: int
+    items: int
+    seconds: float
+    bytes_read: int
+    bytes_written: int
+    cache_hits: int
+    cache_misses: int
+
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __repr__(self) -> str:
+        return f'StageStats({", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)})'
+
+
+class Instrument:
+    __slots__ = ('stages',)
+
+    stages: dict[str, StageStats]
+
+    def __init__(self):
+        self.stages = {}
+
+    def get_stage(self, name: str) -> StageStats:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = StageStats()
+            self.stages[name] = stage
+        return stage
+
+    def add_call(self, name: str, seconds: float):
+        stage = self.get_stage(name)
+        stage.calls += 1
+        stage.seconds += seconds
+
+    def add_items(self, name: str, items: int):
+        self.get_stage(name).items += items
+
+    def add_bytes_read(self, name: str, size: int):
+        self.get_stage(name).bytes_read += size
+
+    def add_bytes_written(self, name: str, size: int):
+        self.get_stage(name).bytes_written += size
+
+    def add_cache_hits(self, name: str, hits: int = 1):
+        self.get_stage(name).cache_hits += hits
+
+    def add_cache_misses(self, name: str, misses: int = 1):
+        self.get_stage(name).cache_misses += misses
+
+
+_current_instrument: ContextVar[Instrument | None] = ContextVar('pixel_font_knife_instrument', default=None)
+
+
+def get_instrument() -> Instrument | None:
+    return _current_instrument.get()
+
+
+@contextmanager
+def instrument(target: Instrument | None = None) -> Iterator[Instrument]:
+    if target is None:
+        target = Instrument()
+    token = _current_instrument.set(target)
+    try:
+        yield target
+    finally:
+        _current_instrument.reset(token)
+
+
+def timed[**P, R](name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            target = _current_instrument.get()
+            if target is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                target.add_call(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import json
+import os
+from array import array
+from collections import deque
+from collections.abc import Iterator
 from os import PathLike
 from pathlib import Path
 
-import yaml
-
-from pixel_font_knife.glyph_file_util import GlyphFlavorGroup
+from pixel_font_knife import instrument_util, yaml_util
+from pixel_font_knife.glyph_file_util import GlyphFile, GlyphFlavorGroup
+from pixel_font_knife.mono_bitmap import MonoBitmap
+from pixel_font_knife.progress_util import CancelToken, ProgressCallback
 
 
 class KerningConfig:
     @staticmethod
-    def load(file_path: str | PathLike[str]) -> KerningConfig:
-        if isinstance(file_path, str):
-            file_path = Path(file_path)
-
-        data = yaml.safe_load(file_path.read_bytes())
+    def load(
+            file_path: str | PathLike[str],
+            cache_dir: str | PathLike[str] | None = None,
+    ) -> KerningConfig:
+        data = yaml_util.load_yaml(file_path, cache_dir)
 
         groups = {}
         for group_name, alphabet in data['groups'].items():
@@ -32,6 +38,8 @@ class KerningConfig:
             templates,
         )
 
+    __slots__ = ('groups', 'templates')
+
     groups: dict[str, list[str]]
     templates: dict[tuple[str, str], int]
 
@@ -43,39 +51,475 @@ class KerningConfig:
         self.groups = groups
         self.templates = templates
 
+    def compile(self, context: dict[int, GlyphFlavorGroup] | None = None) -> CompiledKerningConfig:
+        templates = {}
+        for group_names, offset in self.templates.items():
+            if offset < 0:
+                templates[group_names] = offset
+
+        groups = {}
+        for group_names in templates:
+            for group_name in group_names:
+                if group_name in groups:
+                    continue
+                code_points = array('i')
+                for c in dict.fromkeys(self.groups[group_name]):
+                    code_point = ord(c)
+                    if context is None or code_point in context:
+                        code_points.append(code_point)
+                groups[group_name] = code_points
+
+        return CompiledKerningConfig(groups, templates)
+
+
+class CompiledKerningConfig:
+    __slots__ = ('groups', 'templates')
+
+    groups: dict[str, array[int]]
+    templates: dict[tuple[str, str], int]
+
+    def __init__(
+            self,
+            groups: dict[str, array[int]],
+            templates: dict[tuple[str, str], int],
+    ):
+        self.groups = groups
+        self.templates = templates
+
+
+_KERNING_CACHE_VERSION = 2
+
+
+def _to_row_bits(bitmap: MonoBitmap) -> list[int]:
+    return [int(''.join(map(str, reversed(bitmap_row))), 2) if len(bitmap_row) > 0 else 0 for bitmap_row in bitmap]
+
+
+def _spread_row_bits(row: int, size: int, row_mask: int) -> int:
+    spread_row = row
+    for i in range(1, size + 1):
+        spread_row |= (row << i) | (row >> i)
+    return spread_row & row_mask
+
+
+def _expand_row_bits(rows: list[int], width: int, size: int, shape: str) -> list[int]:
+    if size <= 0:
+        raise ValueError(f'stroke size must be positive: {size}')
+
+    row_mask = (1 << width) - 1
+    height = len(rows)
+    mask_rows = []
+    if shape == 'square':
+        spread_rows = [_spread_row_bits(row, size, row_mask) for row in rows]
+        for y in range(height):
+            mask_row = 0
+            for spread_row in spread_rows[max(y - size, 0):y + size + 1]:
+                mask_row |= spread_row
+            mask_rows.append(mask_row)
+    elif shape == 'diamond':
+        for y in range(height):
+            mask_row = 0
+            for sy in range(max(y - size, 0), min(y + size + 1, height)):
+                mask_row |= _spread_row_bits(rows[sy], size - abs(sy - y), row_mask)
+            mask_rows.append(mask_row)
+    elif shape == 'cross':
+        for y in range(height):
+            mask_row = _spread_row_bits(rows[y], size, row_mask)
+            for row in rows[max(y - size, 0):y + size + 1]:
+                mask_row |= row
+            mask_rows.append(mask_row)
+    elif shape == 'horizontal':
+        for row in rows:
+            mask_rows.append(_spread_row_bits(row, size, row_mask))
+    else:
+        raise ValueError(f'illegal expand shape: {shape!r}')
+    return mask_rows
+
+
+class KerningProfile:
+    @staticmethod
+    def create(bitmap: MonoBitmap, expand_size: int = 1, expand_shape: str = 'square') -> KerningProfile:
+        rows = _to_row_bits(bitmap)
+        mask_rows = _expand_row_bits(rows, bitmap.width, expand_size, expand_shape)
+        return KerningProfile(bitmap.width, rows, mask_rows, bitmap.calculate_content_hash())
+
+    __slots__ = ('width', 'rows', 'mask_rows', 'content_hash', 'left_edges', 'right_edges')
+
+    width: int
+    rows: list[int]
+    mask_rows: list[int]
+    content_hash: str
+    left_edges: list[int]
+    right_edges: list[int]
+
+    def __init__(self, width: int, rows: list[int], mask_rows: list[int], content_hash: str):
+        self.width = width
+        self.rows = rows
+        self.mask_rows = mask_rows
+        self.content_hash = content_hash
+        self.left_edges = [(row & -row).bit_length() - 1 for row in rows]
+        self.right_edges = [mask_row.bit_length() - 1 for mask_row in mask_rows]
+
+    def is_overlapped(self, other: KerningProfile, x: int) -> bool:
+        for mask_row, other_row in zip(self.mask_rows, other.rows):
+            if x >= 0:
+                other_row <<= x
+            else:
+                other_row >>= -x
+            if mask_row & other_row != 0:
+                return True
+        return False
+
+    def calculate_min_offset(self, other: KerningProfile) -> int | None:
+        min_x = None
+        for right_edge, left_edge in zip(self.right_edges, other.left_edges):
+            if right_edge < 0 or left_edge < 0:
+                continue
+            x = right_edge - left_edge + 1
+            if min_x is None or x > min_x:
+                min_x = x
+        if min_x is None:
+            return None
+        return min_x - self.width
+
+    def calculate_offset(self, other: KerningProfile, offset: int) -> int:
+        start_x = self.width + offset
+        if start_x + other.width <= 0:
+            return offset
+        min_offset = self.calculate_min_offset(other)
+        if min_offset is None or offset >= min_offset:
+            return offset
+
+        collisions = 0
+        for mask_row, right_edge, other_row, left_edge in zip(self.mask_rows, self.right_edges, other.rows, other.left_edges):
+            if right_edge < 0 or left_edge < 0 or right_edge - left_edge < start_x:
+                continue
+            mask_row <<= other.width
+            while other_row != 0:
+                lowest_bit = other_row & -other_row
+                collisions |= mask_row >> (lowest_bit.bit_length() - 1)
+                other_row ^= lowest_bit
+
+        free_offsets = ~collisions >> (start_x + other.width)
+        return offset + (free_offsets & -free_offsets).bit_length() - 1
+
+
+class KerningCache:
+    @staticmethod
+    def load(file_path: str | PathLike[str]) -> KerningCache:
+        if isinstance(file_path, str):
+            file_path = Path(file_path)
+
+        cache = KerningCache()
+        if file_path.is_file():
+            try:
+                data = json.loads(file_path.read_bytes())
+                if isinstance(data, dict) and data.get('version') == _KERNING_CACHE_VERSION:
+                    values = {}
+                    for left_hash, right_hash, offset, expand_size, expand_shape, value in data['values']:
+                        values[(left_hash, right_hash, offset, expand_size, expand_shape)] = value
+                    cache.values = values
+            except (ValueError, TypeError, KeyError):
+                pass
+        return cache
+
+    __slots__ = ('values',)
+
+    values: dict[tuple[str, str, int, int, str], int]
+
+    def __init__(self, values: dict[tuple[str, str, int, int, str], int] | None = None):
+        self.values = {} if values is None else values
+
+    def save(self, file_path: str | PathLike[str]):
+        if isinstance(file_path, str):
+            file_path = Path(file_path)
+
+        data = {
+            'version': _KERNING_CACHE_VERSION,
+            'values': [[*key, value] for key, value in self.values.items()],
+        }
+        temp_path = file_path.with_name(f'{file_path.name}.{os.getpid()}.tmp')
+        try:
+            temp_path.write_text(json.dumps(data, separators=(',', ':')), 'utf-8')
+            temp_path.replace(file_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+
+def _get_group_items(
+        kerning_config: CompiledKerningConfig,
+        context: dict[int, GlyphFlavorGroup],
+        flavor: str | None,
+        group_name: str,
+        profiles: list[KerningProfile],
+        profile_ids: dict[GlyphFile, int],
+        expand_size: int,
+        expand_shape: str,
+        cancel_token: CancelToken | None,
+) -> list[tuple[str, int]]:
+    items = []
+    for code_point in kerning_config.groups[group_name]:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        flavor_group = context.get(code_point)
+        if flavor_group is None:
+            continue
+        glyph_file = flavor_group.get_file(flavor)
+        profile_id = profile_ids.get(glyph_file)
+        if profile_id is None:
+            profile_id = len(profiles)
+            profiles.append(KerningProfile.create(glyph_file.bitmap, expand_size, expand_shape))
+            profile_ids[glyph_file] = profile_id
+        items.append((glyph_file.glyph_name, profile_id))
+    return items
+
+
+_worker_profiles: list[KerningProfile] = []
+
+
+def _init_kerning_worker(profiles: list[KerningProfile]):
+    global _worker_profiles
+    _worker_profiles = profiles
+
+
+def _calculate_kerning_task(task: list[tuple[int, int, int]], profiles: list[KerningProfile] | None = None) -> list[int]:
+    if profiles is None:
+        profiles = _worker_profiles
+    return [profiles[left_id].calculate_offset(profiles[right_id], offset) for left_id, right_id, offset in task]
+
+
+def _iter_kerning_offsets[T](
+        tasks: Iterator[tuple[T, list[tuple[int, int, int]]]],
+        profiles: list[KerningProfile],
+        workers: int,
+        cancel_token: CancelToken | None,
+) -> Iterator[tuple[T, list[int]]]:
+    if workers <= 1:
+        for payload, task in tasks:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            yield payload, _calculate_kerning_task(task, profiles)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers, initializer=_init_kerning_worker, initargs=(profiles,)) as executor:
+        futures = deque()
+        try:
+            for payload, task in tasks:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                futures.append((payload, None if len(task) == 0 else executor.submit(_calculate_kerning_task, task)))
+                while len(futures) >= workers * 2:
+                    payload, future = futures.popleft()
+                    yield payload, [] if future is None else future.result()
+            while len(futures) > 0:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                payload, future = futures.popleft()
+                yield payload, [] if future is None else future.result()
+        finally:
+            for _, future in futures:
+                if future is not None:
+                    future.cancel()
+
+
+def _iter_kerning_slots(
+        kerning_config: CompiledKerningConfig,
+        flavors_groups_items: dict[str | None, dict[str, list[tuple[str, int]]]],
+        chunk_size: int,
+) -> Iterator[list[tuple[str | None, str, str, int, int, int]]]:
+    slots = []
+    for flavor, groups_items in flavors_groups_items.items():
+        for (left_group_name, right_group_name), offset in kerning_config.templates.items():
+            right_items = groups_items[right_group_name]
+            for left_glyph_name, left_id in groups_items[left_group_name]:
+                for right_glyph_name, right_id in right_items:
+                    slots.append((flavor, left_glyph_name, right_glyph_name, left_id, right_id, offset))
+                    if len(slots) >= chunk_size:
+                        yield slots
+                        slots = []
+    if len(slots) > 0:
+        yield slots
+
+
+@instrument_util.timed('calculate_kerning_values')
+def calculate_flavors_kerning_values(
+        kerning_config: KerningConfig | CompiledKerningConfig,
+        context: dict[int, GlyphFlavorGroup],
+        flavors: list[str | None],
+        workers: int = 1,
+        chunk_size: int = 4096,
+        cache: KerningCache | None = None,
+        expand_size: int = 1,
+        expand_shape: str = 'square',
+        progress: ProgressCallback | None = None,
+        cancel_token: CancelToken | None = None,
+) -> dict[str | None, dict[tuple[str, str], int]]:
+    if isinstance(kerning_config, KerningConfig):
+        kerning_config = kerning_config.compile(context)
+
+    profiles = []
+    profile_ids = {}
+    flavors_groups_items = {}
+    for flavor in flavors:
+        if flavor in flavors_groups_items:
+            continue
+
+        groups_items = {}
+        for group_name in kerning_config.groups:
+            groups_items[group_name] = _get_group_items(kerning_config, context, flavor, group_name, profiles, profile_ids, expand_size, expand_shape, cancel_token)
+        flavors_groups_items[flavor] = groups_items
+
+    total = 0
+    for groups_items in flavors_groups_items.values():
+        for left_group_name, right_group_name in kerning_config.templates:
+            total += len(groups_items[left_group_name]) * len(groups_items[right_group_name])
+
+    deduplicate = len(flavors_groups_items) > 1
+    memo = {}
+    cache_hits = 0
+    cache_misses = 0
+
+    def iter_tasks() -> Iterator[tuple[tuple[list, list, list[int]], list[tuple[int, int, int]]]]:
+        nonlocal cache_hits, cache_misses
+        for slots in _iter_kerning_slots(kerning_config, flavors_groups_items, chunk_size):
+            slot_offsets = []
+            pending_positions = []
+            task = []
+            for position, (_, _, _, left_id, right_id, offset) in enumerate(slots):
+                key = left_id, right_id, offset
+                if deduplicate and key in memo:
+                    slot_offsets.append(memo[key])
+                    continue
+
+                actual_offset = None
+                if cache is not None:
+                    actual_offset = cache.values.get((profiles[left_id].content_hash, profiles[right_id].content_hash, offset, expand_size, expand_shape))
+                    if actual_offset is None:
+                        cache_misses += 1
+                    else:
+                        cache_hits += 1
+                if deduplicate:
+                    memo[key] = actual_offset
+                if actual_offset is None:
+                    pending_positions.append(position)
+                    task.append(key)
+                slot_offsets.append(actual_offset)
+            yield (slots, slot_offsets, pending_positions), task
+
+    flavors_kerning_values = {flavor: {} for flavor in flavors_groups_items}
+    done = 0
+    if progress is not None:
+        progress(done, total)
+
+    for (slots, slot_offsets, pending_positions), chunk_offsets in _iter_kerning_offsets(iter_tasks(), profiles, workers, cancel_token):
+        for position, actual_offset in zip(pending_positions, chunk_offsets):
+            slot_offsets[position] = actual_offset
+            _, _, _, left_id, right_id, offset = slots[position]
+            if cache is not None:
+                cache.values[(profiles[left_id].content_hash, profiles[right_id].content_hash, offset, expand_size, expand_shape)] = actual_offset
+            if deduplicate:
+                memo[(left_id, right_id, offset)] = actual_offset
+
+        for (flavor, left_glyph_name, right_glyph_name, left_id, right_id, offset), actual_offset in zip(slots, slot_offsets):
+            if actual_offset is None:
+                actual_offset = memo[(left_id, right_id, offset)]
+            if actual_offset < 0:
+                flavors_kerning_values[flavor][(left_glyph_name, right_glyph_name)] = actual_offset
+
+        done += len(slots)
+        if progress is not None:
+            progress(done, total)
+
+    instrument = instrument_util.get_instrument()
+    if instrument is not None:
+        instrument.add_items('calculate_kerning_values', total)
+        if cache is not None:
+            instrument.add_cache_hits('calculate_kerning_values', cache_hits)
+            instrument.add_cache_misses('calculate_kerning_values', cache_misses)
+
+    return flavors_kerning_values
+
 
 def calculate_kerning_values(
-        kerning_config: KerningConfig,
+        kerning_config: KerningConfig | CompiledKerningConfig,
         context: dict[int, GlyphFlavorGroup],
         flavor: str | None = None,
+        workers: int = 1,
+        chunk_size: int = 4096,
+        cache: KerningCache | None = None,
+        expand_size: int = 1,
+        expand_shape: str = 'square',
+        progress: ProgressCallback | None = None,
+        cancel_token: CancelToken | None = None,
 ) -> dict[tuple[str, str], int]:
-    kerning_values = {}
-    for (left_group_name, right_group_name), offset in kerning_config.templates.items():
-        if offset >= 0:
-            continue
+    return calculate_flavors_kerning_values(kerning_config, context, [flavor], workers, chunk_size, cache, expand_size, expand_shape, progress, cancel_token)[flavor]
 
-        left_group = kerning_config.groups[left_group_name]
-        right_group = kerning_config.groups[right_group_name]
 
-        for left_c in left_group:
-            left_code_point = ord(left_c)
-            if left_code_point not in context:
-                continue
-            left_file = context[left_code_point].get_file(flavor)
-            left_bitmap_mask = left_file.bitmap.pixel_expand(1)
+class ClassKerningValues:
+    __slots__ = ('left_classes', 'right_classes', 'class_values', 'exceptions')
 
-            for right_c in right_group:
-                right_code_point = ord(right_c)
-                if right_code_point not in context:
-                    continue
-                right_file = context[right_code_point].get_file(flavor)
+    left_classes: dict[str, list[str]]
+    right_classes: dict[str, list[str]]
+    class_values: dict[tuple[str, str], int]
+    exceptions: dict[tuple[str, str], int]
+
+    def __init__(
+            self,
+            left_classes: dict[str, list[str]],
+            right_classes: dict[str, list[str]],
+            class_values: dict[tuple[str, str], int],
+            exceptions: dict[tuple[str, str], int],
+    ):
+        self.left_classes = left_classes
+        self.right_classes = right_classes
+        self.class_values = class_values
+        self.exceptions = exceptions
+
+    def to_kerning_values(self) -> dict[tuple[str, str], int]:
+        kerning_values = {}
+        for (left_class_name, right_class_name), value in self.class_values.items():
+            for left_glyph_name in self.left_classes[left_class_name]:
+                for right_glyph_name in self.right_classes[right_class_name]:
+                    kerning_values[(left_glyph_name, right_glyph_name)] = value
+        kerning_values.update(self.exceptions)
+        return kerning_values
+
+
+def _cluster_glyph_names(glyph_names_values: dict[str, dict[str, int]], prefix: str) -> tuple[dict[str, list[str]], dict[str, str]]:
+    clusters = {}
+    for glyph_name, values in glyph_names_values.items():
+        clusters.setdefault(frozenset(values.items()), []).append(glyph_name)
+
+    classes = {}
+    glyph_classes = {}
+    for glyph_names in clusters.values():
+        if len(glyph_names) < 2:
+            continue
+        class_name = f'{prefix}_{len(classes) + 1}'
+        classes[class_name] = glyph_names
+        for glyph_name in glyph_names:
+            glyph_classes[glyph_name] = class_name
+    return classes, glyph_classes
+
+
+def compress_kerning_values(kerning_values: dict[tuple[str, str], int]) -> ClassKerningValues:
+    left_values = {}
+    right_values = {}
+    for (left_glyph_name, right_glyph_name), value in kerning_values.items():
+        left_values.setdefault(left_glyph_name, {})[right_glyph_name] = value
+        right_values.setdefault(right_glyph_name, {})[left_glyph_name] = value
 
-                actual_offset = offset
-                while actual_offset < 0:
-                    if not left_bitmap_mask.is_overlapped(right_file.bitmap, x=left_bitmap_mask.width + actual_offset):
-                        break
-                    actual_offset += 1
+    left_classes, left_glyph_classes = _cluster_glyph_names(left_values, 'left')
+    right_classes, right_glyph_classes = _cluster_glyph_names(right_values, 'right')
 
-                if actual_offset < 0:
-                    kerning_values[(left_file.glyph_name, right_file.glyph_name)] = actual_offset
-    return kerning_values
+    class_values = {}
+    exceptions = {}
+    for (left_glyph_name, right_glyph_name), value in kerning_values.items():
+        left_class_name = left_glyph_classes.get(left_glyph_name)
+        right_class_name = right_glyph_classes.get(right_glyph_name)
+        if left_class_name is None or right_class_name is None:
+            exceptions[(left_glyph_name, right_glyph_name)] = value
+        else:
+            class_values[(left_class_name, right_class_name)] = value
+    return ClassKerningValues(left_classes, right_classes, class_values, exceptions)
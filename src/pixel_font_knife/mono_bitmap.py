@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import hashlib
+import os
 from collections import UserList
 from io import StringIO
 from os import PathLike
-from typing import Any, BinaryIO
+from typing import Any, BinaryIO, TYPE_CHECKING
 
-from pixel_font_knife.internal import png
+from pixel_font_knife import instrument_util
+
+if TYPE_CHECKING:
+    from pixel_font_knife.internal import png
 
 
 class MonoBitmap(UserList[list[int]]):
@@ -19,7 +24,12 @@ class MonoBitmap(UserList[list[int]]):
         return bitmap
 
     @staticmethod
+    @instrument_util.timed('mono_bitmap.load_png')
     def load_png(file_path: str | PathLike[str]) -> MonoBitmap:
+        instrument = instrument_util.get_instrument()
+        if instrument is not None:
+            instrument.add_bytes_read('mono_bitmap.load_png', os.path.getsize(file_path))
+        from pixel_font_knife.internal import png
         width, height, rows, _ = png.Reader(filename=file_path).read()
         bitmap = MonoBitmap()
         bitmap.width = width
@@ -199,6 +209,14 @@ class MonoBitmap(UserList[list[int]]):
             bitmap.append(bitmap_row)
         return bitmap
 
+    def calculate_content_hash(self) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(self.width.to_bytes(4, 'little'))
+        hasher.update(self.height.to_bytes(4, 'little'))
+        for bitmap_row in self:
+            hasher.update(bytes(bitmap_row))
+        return hasher.hexdigest()
+
     def draw(self, white: str = '  ', black: str = '██', end: str | None = None) -> str:
         text = StringIO()
         for bitmap_row in self:
@@ -210,6 +228,7 @@ class MonoBitmap(UserList[list[int]]):
         return text.getvalue()
 
     def _build_png(self, color: tuple[int, int, int]) -> png.Image:
+        from pixel_font_knife.internal import png
         red, green, blue = color
         rows = []
         for bitmap_row in self:
@@ -225,8 +244,12 @@ class MonoBitmap(UserList[list[int]]):
     def dump_png(self, stream: BinaryIO, color: tuple[int, int, int] = (0, 0, 0)):
         self._build_png(color).write(stream)
 
+    @instrument_util.timed('mono_bitmap.save_png')
     def save_png(self, file_path: str | PathLike[str], color: tuple[int, int, int] = (0, 0, 0)):
         self._build_png(color).save(file_path)
+        instrument = instrument_util.get_instrument()
+        if instrument is not None:
+            instrument.add_bytes_written('mono_bitmap.save_png', os.path.getsize(file_path))
 
     def copy(self) -> MonoBitmap:
         bitmap = MonoBitmap()
@@ -0,0 +1,27 @@
+from collections.abc import Callable
+
+type ProgressCallback = Callable[[int, int], None]
+
+
+class CancelledError(Exception):
+    pass
+
+
+class CancelToken:
+    __slots__ = ('_cancelled',)
+
+    _cancelled: bool
+
+    def __init__(self):
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def raise_if_cancelled(self):
+        if self._cancelled:
+            raise CancelledError('operation cancelled')
@@ -0,0 +1,50 @@
+import functools
+import hashlib
+import marshal
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Any
+
+
+@functools.cache
+def _get_safe_loader() -> type:
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    return SafeLoader
+
+
+def _parse_yaml(data: bytes) -> Any:
+    import yaml
+    return yaml.load(data, _get_safe_loader())
+
+
+def load_yaml(file_path: str | PathLike[str], cache_dir: str | PathLike[str] | None = None) -> Any:
+    if isinstance(file_path, str):
+        file_path = Path(file_path)
+    data = file_path.read_bytes()
+
+    if cache_dir is None:
+        return _parse_yaml(data)
+
+    if isinstance(cache_dir, str):
+        cache_dir = Path(cache_dir)
+    cache_path = cache_dir.joinpath(f'{hashlib.sha256(data).hexdigest()}.{marshal.version}.marshal')
+    if cache_path.is_file():
+        try:
+            return marshal.loads(cache_path.read_bytes())
+        except (EOFError, ValueError, TypeError):
+            pass
+
+    value = _parse_yaml(data)
+    try:
+        cache_data = marshal.dumps(value)
+    except ValueError:
+        return value
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+    temp_path.write_bytes(cache_data)
+    temp_path.replace(cache_path)
+    return value
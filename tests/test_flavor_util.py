@@ -0,0 +1,133 @@
+import pytest
+
+from pixel_font_knife import flavor_util
+from pixel_font_knife.flavor_util import FlavorGroup, FlavorTable
+
+
+class IntFlavorGroup(FlavorGroup[int]):
+    value_type = int
+
+    __slots__ = ()
+
+
+def test_normalize_flavor():
+    assert flavor_util.normalize_flavor('ZH_CN') == 'zh_cn'
+    assert flavor_util.normalize_flavor('Zh_Cn') is flavor_util.normalize_flavor('zh_cn')
+
+
+def test_flavor_table():
+    flavor_table = FlavorTable()
+    assert flavor_table.normalize('ZH_CN') == 'zh_cn'
+    assert flavor_table.normalize('zh_cn') is flavor_table.normalize(''.join(['Zh', '_cn']))
+    assert flavor_table.split('ko,ZH_CN,ja') == ('ko', 'zh_cn', 'ja')
+    assert flavor_table.split('ko,ZH_CN,ja')[1] is flavor_table.normalize('zh_cn')
+
+    assert flavor_table.lookup('JA') == 'ja'
+    assert flavor_table.lookup('ZH_HK') == 'zh_hk'
+    assert 'ZH_HK' not in flavor_table
+
+
+def test_flavor_group_lookup():
+    flavor_group = IntFlavorGroup()
+    for i in range(100):
+        flavor = f'Lookup_{i}'
+        assert flavor not in flavor_group
+        assert flavor_group.get(flavor) is None
+        with pytest.raises(KeyError):
+            flavor_group.resolve(flavor)
+        assert flavor not in flavor_util.flavor_table
+
+
+def test_flavor_group():
+    flavor_group = IntFlavorGroup()
+    flavor_group[None] = 0
+    flavor_group['A'] = 1
+    flavor_group['b'] = 2
+
+    assert len(flavor_group) == 3
+    assert list(flavor_group) == [None, 'a', 'b']
+    assert 'a' in flavor_group
+    assert 'B' in flavor_group
+    assert 'c' not in flavor_group
+    assert flavor_group['a'] == flavor_group['A'] == 1
+    assert flavor_group.get('B') == 2
+    assert flavor_group.get('c') is None
+    assert flavor_group == {None: 0, 'a': 1, 'b': 2}
+
+    assert flavor_group.resolve() == 0
+    assert flavor_group.resolve('A') == 1
+    assert flavor_group.resolve('c') == 0
+
+    flavor_group['a'] = None
+    assert 'a' not in flavor_group
+    del flavor_group['B']
+    assert 'b' not in flavor_group
+    del flavor_group[None]
+    with pytest.raises(KeyError):
+        flavor_group.resolve('a')
+
+    with pytest.raises(KeyError):
+        flavor_group[1] = 1
+    with pytest.raises(ValueError):
+        flavor_group['a'] = 'x'
+
+
+def test_flavor_group_update():
+    flavor_group_1 = IntFlavorGroup({'A': 1, None: 0})
+    flavor_group_2 = IntFlavorGroup(b=2)
+    flavor_group_2.update(flavor_group_1)
+    assert flavor_group_2 == {None: 0, 'a': 1, 'b': 2}
+
+    flavor_group_3 = flavor_group_2.copy()
+    assert type(flavor_group_3) is IntFlavorGroup
+    assert flavor_group_3 == flavor_group_2
+    flavor_group_3['c'] = 3
+    assert 'c' not in flavor_group_2
+
+
+def test_flavor_group_copy_on_write():
+    flavor_group_1 = IntFlavorGroup({None: 0, 'a': 1})
+    flavor_group_2 = flavor_group_1.copy()
+    flavor_group_3 = flavor_group_1.copy()
+    assert flavor_group_1 == flavor_group_2 == flavor_group_3
+
+    flavor_group_2['b'] = 2
+    assert 'b' in flavor_group_2
+    assert 'b' not in flavor_group_1
+    assert 'b' not in flavor_group_3
+
+    del flavor_group_1['a']
+    assert 'a' not in flavor_group_1
+    assert flavor_group_2['a'] == flavor_group_3['a'] == 1
+
+    flavor_group_3.update(IntFlavorGroup(c=3))
+    flavor_group_3.pop(None)
+    assert flavor_group_3 == {'a': 1, 'c': 3}
+    assert flavor_group_1 == {None: 0}
+    assert flavor_group_2 == {None: 0, 'a': 1, 'b': 2}
+
+    flavor_group_2.clear()
+    assert len(flavor_group_2) == 0
+    assert flavor_group_1 == {None: 0}
+
+
+def test_flavor_group_dict_api():
+    flavor_group = IntFlavorGroup.fromkeys(['A', 'b'], 1)
+    assert type(flavor_group) is IntFlavorGroup
+    assert flavor_group.data == {'a': 1, 'b': 1}
+
+    merged = flavor_group | {None: 0, 'B': 2}
+    assert type(merged) is IntFlavorGroup
+    assert merged == {'a': 1, 'b': 2, None: 0}
+    assert flavor_group == {'a': 1, 'b': 1}
+
+    merged = {'c': 3} | flavor_group
+    assert type(merged) is IntFlavorGroup
+    assert merged == {'c': 3, 'a': 1, 'b': 1}
+
+    flavor_group |= IntFlavorGroup(c=3)
+    assert flavor_group == {'a': 1, 'b': 1, 'c': 3}
+
+    copied = flavor_group.copy()
+    copied.data['d'] = 4
+    assert 'd' not in flavor_group
@@ -1,3 +1,4 @@
+import shutil
 from pathlib import Path
 
 import pytest
@@ -5,6 +6,7 @@ import pytest
 from pixel_font_knife import glyph_file_util
 from pixel_font_knife.glyph_file_util import GlyphFile, GlyphFlavorGroup
 from pixel_font_knife.mono_bitmap import MonoBitmap
+from pixel_font_knife.progress_util import CancelledError, CancelToken
 
 
 def test_glyph_file_1():
@@ -48,6 +50,44 @@ def test_glyph_file_6():
     assert info.value.args[0] == "not '.png' file: '4E00.txt'"
 
 
+def test_glyph_file_7():
+    glyph_file = GlyphFile.load(Path('4E00 a.png'))
+    assert glyph_file.glyph_name == 'u4E00-A'
+    glyph_file.code_point = 0x4E01
+    assert glyph_file.glyph_name == 'u4E01-A'
+    glyph_file.flavors = ['b']
+    assert glyph_file.glyph_name == 'u4E01-B'
+    glyph_file.flavors = []
+    assert glyph_file.glyph_name == 'u4E01'
+    glyph_file.code_point = -1
+    assert glyph_file.glyph_name == '.notdef'
+
+
+def test_glyph_name_in_place_flavor_edit():
+    glyph_file = GlyphFile.load(Path('4E00 ko,zh_cn.png'))
+    assert glyph_file.glyph_name == 'u4E00-KO'
+    glyph_file.flavors.sort(reverse=True)
+    assert glyph_file.glyph_name == 'u4E00-ZH_CN'
+    glyph_file.flavors.clear()
+    assert glyph_file.glyph_name == 'u4E00'
+    glyph_file.flavors.append('ja')
+    assert glyph_file.glyph_name == 'u4E00-JA'
+
+
+def test_glyph_file_8():
+    glyph_file = GlyphFile.load(Path('4E00.png'))
+    assert not hasattr(glyph_file, '__dict__')
+    with pytest.raises(AttributeError):
+        glyph_file.foo = 'bar'
+
+
+def test_glyph_file_9():
+    glyph_file_1 = GlyphFile.load(Path('4E00 ZH_CN,ko.png'))
+    glyph_file_2 = GlyphFile.load(Path('4E01 ko,zh_cn.png'))
+    assert glyph_file_1.flavors[0] is glyph_file_2.flavors[1]
+    assert glyph_file_1.flavors[1] is glyph_file_2.flavors[0]
+
+
 def test_flavor_group():
     flavor_group = GlyphFlavorGroup()
 
@@ -63,6 +103,10 @@ def test_flavor_group():
     assert flavor_group.get_file('A') == flavor_group.get_file('a') == glyph_file_ab
     assert flavor_group.get_file('B') == flavor_group.get_file('b') == glyph_file_ab
 
+    with pytest.raises(KeyError) as info:
+        GlyphFlavorGroup().get_file('A')
+    assert info.value.args[0] == "no flavor file: 'A'"
+
 
 def test_context(glyphs_dir: Path):
     context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
@@ -104,3 +148,41 @@ def test_context(glyphs_dir: Path):
         0x4E11: 'u4E11-ZH_CN',
         0x6AA4: 'u6AA4',
     }
+
+
+def test_load_bitmaps(glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    progresses = []
+    glyph_file_util.load_bitmaps(context, lambda done, total: progresses.append((done, total)))
+    assert progresses == [(i, 6) for i in range(1, 7)]
+    assert all(glyph_file._bitmap is not None for flavor_group in context.values() for glyph_file in flavor_group.values())
+
+    cancel_token = CancelToken()
+    cancel_token.cancel()
+    with pytest.raises(CancelledError):
+        glyph_file_util.load_bitmaps(glyph_file_util.load_context(glyphs_dir.joinpath('context')), cancel_token=cancel_token)
+
+
+def test_normalize_context_cancel(glyphs_dir: Path, tmp_path: Path):
+    root_dir = tmp_path.joinpath('context')
+    shutil.copytree(glyphs_dir.joinpath('context'), root_dir)
+    context = glyph_file_util.load_context(root_dir)
+
+    cancel_token = CancelToken()
+    progresses = []
+
+    def progress(done: int, total: int):
+        progresses.append((done, total))
+        cancel_token.cancel()
+
+    with pytest.raises(CancelledError):
+        glyph_file_util.normalize_context(context, root_dir, progress=progress, cancel_token=cancel_token)
+    assert progresses == [(1, 3)]
+    for flavor_group in context.values():
+        for glyph_file in flavor_group.values():
+            assert glyph_file.file_path.is_file()
+    for file_dir, _, _ in root_dir.walk():
+        assert any(file_dir.iterdir())
+
+    glyph_file_util.normalize_context(context, root_dir)
+    assert glyph_file_util.load_context(root_dir).keys() == context.keys()
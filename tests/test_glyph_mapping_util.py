@@ -1,6 +1,12 @@
+import struct
+from io import StringIO
 from pathlib import Path
 
+import pytest
+
 from pixel_font_knife import glyph_mapping_util, glyph_file_util
+from pixel_font_knife.glyph_file_util import GlyphFlavorGroup
+from pixel_font_knife.glyph_mapping_util import MappingIndex, SourceFlavorGroup, SourceGlyph
 
 
 def test_load(assets_dir: Path, glyphs_dir: Path, tmp_path: Path):
@@ -10,6 +16,9 @@ def test_load(assets_dir: Path, glyphs_dir: Path, tmp_path: Path):
     mapping = glyph_mapping_util.load_mapping(load_path)
     glyph_mapping_util.save_mapping(mapping, save_path)
     assert load_path.read_text('utf-8') == save_path.read_text('utf-8')
+    dump_stream = StringIO()
+    glyph_mapping_util.dump_mapping(mapping, dump_stream)
+    assert load_path.read_text('utf-8') == dump_stream.getvalue()
 
     assert len(mapping) == 2
 
@@ -41,3 +50,244 @@ def test_load(assets_dir: Path, glyphs_dir: Path, tmp_path: Path):
     assert context[0x0005][None] == context[0x6AA4][None]
     assert context[0x0005]['ko'] == context[0x6AA4]['ko']
     assert context[0x0005]['zh_cn'] == context[0x6AA4][None]
+
+    context[0x0004]['ko'] = None
+    assert 'ko' not in context[0x0004]
+    assert 'ko' in context[0x6AA4]
+
+
+def test_load_cache(assets_dir: Path, tmp_path: Path):
+    load_path = assets_dir.joinpath('mapping-example.yaml')
+    save_path = tmp_path.joinpath('mapping-example.yaml')
+    cache_dir = tmp_path.joinpath('cache')
+
+    for _ in range(2):
+        mapping = glyph_mapping_util.load_mapping(load_path, cache_dir)
+        glyph_mapping_util.save_mapping(mapping, save_path)
+        assert load_path.read_text('utf-8') == save_path.read_text('utf-8')
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_save_invalid(assets_dir: Path, tmp_path: Path):
+    save_path = tmp_path.joinpath('mapping.yaml')
+    save_path.write_bytes(assets_dir.joinpath('mapping-example.yaml').read_bytes())
+    mapping = {
+        0x0041: SourceFlavorGroup({None: SourceGlyph(0x0042, None)}),
+        0x0050: SourceFlavorGroup({'*': SourceGlyph(0x0051, None), 'zh_cn': SourceGlyph(0x0052, None)}),
+    }
+    with pytest.raises(RuntimeError):
+        glyph_mapping_util.save_mapping(mapping, save_path)
+    assert save_path.read_bytes() == assets_dir.joinpath('mapping-example.yaml').read_bytes()
+    assert list(tmp_path.iterdir()) == [save_path]
+
+
+def test_apply_transitive(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x0002, None)}),
+        0x0002: SourceFlavorGroup({None: SourceGlyph(0x0003, None), 'zh_cn': SourceGlyph(0x4E11, 'zh_cn')}),
+        0x0003: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, None)}),
+        0x4E11: SourceFlavorGroup({'ko': SourceGlyph(0x4E11, 'zh_cn')}),
+    }
+
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    glyph_mapping_util.apply_mapping(context, mapping)
+    assert 0x0001 not in context
+    assert 0x0003 in context
+    assert len(context[0x0002]) == 1
+
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    group_4e11 = context[0x4E11]
+    group_6aa4 = context[0x6AA4]
+    glyph_mapping_util.apply_mapping(context, mapping, transitive=True)
+    assert context[0x0003] == group_6aa4
+    assert len(context[0x0002]) == 2
+    assert context[0x0002][None] is group_6aa4[None]
+    assert context[0x0002]['zh_cn'] is group_4e11['zh_cn']
+    assert context[0x0001] == context[0x0002]
+    assert len(context[0x4E11]) == 3
+    assert context[0x4E11]['ko'] is group_4e11['zh_cn']
+    assert len(group_4e11) == 2
+
+
+def test_apply_transitive_cycle(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x0002, None)}),
+        0x0002: SourceFlavorGroup({None: SourceGlyph(0x6AA4, None), 'ko': SourceGlyph(0x0003, 'ko')}),
+        0x0003: SourceFlavorGroup({'*': SourceGlyph(0x0001, None)}),
+    }
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    with pytest.raises(RuntimeError) as info:
+        glyph_mapping_util.apply_mapping(context, mapping, transitive=True)
+    assert info.value.args[0] == 'circular mapping: 0x0001 -> 0x0002 -> 0x0003 -> 0x0001'
+
+
+def test_mapping_index(assets_dir: Path, glyphs_dir: Path):
+    mapping = glyph_mapping_util.load_mapping(assets_dir.joinpath('mapping-example.yaml'))
+    index = MappingIndex.build(mapping)
+    assert 0x6AA4 in index
+    assert 0x0004 not in index
+
+    source_context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    assert index.get_dependents(0x6AA4, source_context=source_context) == {(0x0004, '*'), (0x0005, None), (0x0005, 'zh_cn'), (0x0005, 'zh_hk')}
+    assert index.get_dependents(0x6AA4) == {(0x0004, '*'), (0x0005, None), (0x0005, 'zh_cn'), (0x0005, 'zh_hk'), (0x0005, 'ko')}
+    assert index.get_dependents(0x6AA4, 'JA') == {(0x0004, '*'), (0x0005, 'zh_cn'), (0x0005, 'zh_hk')}
+    assert index.get_dependents(0x6AA4, 'ko') == {(0x0004, '*'), (0x0005, 'ko')}
+    assert index.get_dependents(0x6AA4, 'zh_tw') == {(0x0004, '*')}
+    assert index.get_dependent_code_points(0x6AA4) == {0x0004, 0x0005}
+
+    index.update(0x0005, SourceFlavorGroup({None: SourceGlyph(0x4E11, None)}))
+    assert index.get_dependents(0x6AA4, 'ja') == {(0x0004, '*')}
+    assert index.get_dependents(0x6AA4) == {(0x0004, '*')}
+    assert index.get_dependents(0x4E11) == {(0x0005, None)}
+
+    index.remove(0x0004)
+    index.remove(0x0004)
+    assert 0x6AA4 not in index
+    assert index.get_dependent_code_points(0x6AA4) == set()
+
+
+def test_reapply(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x0002, None)}),
+        0x0002: SourceFlavorGroup({None: SourceGlyph(0x0003, None), 'zh_cn': SourceGlyph(0x4E11, 'zh_cn')}),
+        0x0003: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, None)}),
+        0x0004: SourceFlavorGroup({'ko': SourceGlyph(0x4E11, 'zh_cn')}),
+    }
+    mapping_index = MappingIndex.build(mapping)
+
+    source_context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    context = dict(source_context)
+    glyph_mapping_util.apply_mapping(context, mapping, transitive=True)
+
+    group_4e11 = source_context[0x4E11]
+    source_context[0x6AA4] = GlyphFlavorGroup({None: group_4e11[None], 'ja': group_4e11['zh_cn']})
+    affected_code_points = glyph_mapping_util.reapply_mapping(context, source_context, mapping, [0x6AA4], mapping_index)
+    assert affected_code_points == {0x0001, 0x0002, 0x0003, 0x6AA4}
+
+    expected_context = dict(source_context)
+    glyph_mapping_util.apply_mapping(expected_context, mapping, transitive=True)
+    assert context == expected_context
+    assert context[0x0001][None] is group_4e11[None]
+
+    del source_context[0x4E11]
+    glyph_mapping_util.reapply_mapping(context, source_context, mapping, [0x4E11], mapping_index)
+    expected_context = dict(source_context)
+    glyph_mapping_util.apply_mapping(expected_context, mapping, transitive=True)
+    assert context == expected_context
+    assert 0x4E11 not in context
+    assert 0x0004 not in context
+
+
+def test_reapply_isolated(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, None)}),
+    }
+    source_context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    context = dict(source_context)
+    glyph_mapping_util.apply_mapping(context, mapping)
+
+    glyph_mapping_util.reapply_mapping(context, source_context, mapping, [0x4E11, 0x6AA4])
+    assert context[0x4E11] == source_context[0x4E11]
+    assert context[0x4E11] is not source_context[0x4E11]
+    context[0x4E11]['ko'] = context[0x4E11]['zh_cn']
+    context[0x6AA4]['ja'] = context[0x6AA4][None]
+    context[0x0001]['ja'] = context[0x6AA4][None]
+    assert 'ko' not in source_context[0x4E11]
+    assert 'ja' not in source_context[0x6AA4]
+
+
+def test_compiled_mapping(assets_dir: Path, tmp_path: Path):
+    load_path = assets_dir.joinpath('mapping-example.yaml')
+    compiled_path = tmp_path.joinpath('mapping-example.bin')
+    save_path = tmp_path.joinpath('mapping-example.yaml')
+
+    glyph_mapping_util.compile_mapping(load_path, compiled_path)
+    mapping = glyph_mapping_util.load_compiled_mapping(compiled_path)
+    glyph_mapping_util.save_mapping(mapping, save_path)
+    assert load_path.read_text('utf-8') == save_path.read_text('utf-8')
+
+    assert mapping[0x0004]['*'].code_point == 0x6AA4
+    assert mapping[0x0004]['*'].flavor is None
+    assert mapping[0x0005]['zh_hk'].code_point == 0x6AA4
+    assert mapping[0x0005]['zh_hk'].flavor == 'ja'
+
+    with pytest.raises(ValueError) as info:
+        glyph_mapping_util.load_compiled_mapping(load_path)
+    assert info.value.args[0] == f"not compiled mapping file: '{load_path}'"
+
+    data = compiled_path.read_bytes()
+    truncated_path = tmp_path.joinpath('truncated.bin')
+    for size in (2, 14, len(data) - 4, len(data) - 1):
+        truncated_path.write_bytes(data[:size])
+        with pytest.raises(ValueError) as info:
+            glyph_mapping_util.load_compiled_mapping(truncated_path)
+        assert info.value.args[0] == f"not compiled mapping file: '{truncated_path}'"
+
+    header = struct.pack('<4sII', b'PFKM', 1, 1) + struct.pack('<H', 2) + b'ko'
+    for records in ((0x0041, 2, -1, -1, 0x0042), (0x0041, -1), (0x0041, 1, -2, -1, 0x0042), (0x0041, 1, -1, 1, 0x0042)):
+        truncated_path.write_bytes(header + struct.pack(f'<I{len(records)}i', len(records), *records))
+        with pytest.raises(ValueError) as info:
+            glyph_mapping_util.load_compiled_mapping(truncated_path)
+        assert info.value.args[0] == f"not compiled mapping file: '{truncated_path}'"
+
+    with pytest.raises(struct.error):
+        glyph_mapping_util.save_compiled_mapping({1 << 40: SourceFlavorGroup({None: SourceGlyph(0x0041, None)})}, compiled_path)
+    assert compiled_path.read_bytes() == data
+
+
+def test_validate(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x0002, None)}),
+        0x0002: SourceFlavorGroup({None: SourceGlyph(0x0003, None), 'ko': SourceGlyph(0x0001, None)}),
+        0x0003: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, 'ko'), 'ja': SourceGlyph(0x4E11, 'zh_cn')}),
+        0x0004: SourceFlavorGroup({None: SourceGlyph(0x0005, None), 'ko': SourceGlyph(0x6AA4, 'ja')}),
+        0x4E11: SourceFlavorGroup({'zh_cn': SourceGlyph(0x6AA4, 'zh_tw')}),
+    }
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    diagnostics = glyph_mapping_util.validate_mapping(mapping, context, transitive=True)
+    assert [(diagnostic.kind, diagnostic.code_point, diagnostic.flavor) for diagnostic in diagnostics] == [
+        ('wildcard-mixed', 0x0003, '*'),
+        ('wildcard-source-flavor', 0x0003, '*'),
+        ('missing-source', 0x0004, None),
+        ('missing-source-flavor', 0x0004, 'ko'),
+        ('shadowed', 0x4E11, 'zh_cn'),
+        ('circular', 0x0001, None),
+    ]
+    assert diagnostics[2].message == "0x0004 flavor None source 0x0005 not found"
+    assert diagnostics[3].message == "0x0004 flavor 'ko' source 0x6AA4 has no flavor 'ja', falls back to default flavor"
+    assert diagnostics[4].message == "0x4E11 flavor 'zh_cn' shadows an existing glyph file"
+    assert diagnostics[5].message == 'circular mapping: 0x0001 -> 0x0002 -> 0x0001'
+
+
+def test_validate_one_hop(glyphs_dir: Path):
+    mapping = {
+        0x0001: SourceFlavorGroup({'*': SourceGlyph(0x0002, None)}),
+        0x0002: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, None)}),
+        0x4E11: SourceFlavorGroup({'*': SourceGlyph(0x6AA4, None)}),
+        0x6AA4: SourceFlavorGroup({'*': SourceGlyph(0x4E11, None)}),
+    }
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    diagnostics = glyph_mapping_util.validate_mapping(mapping, context)
+    assert [(diagnostic.kind, diagnostic.code_point, diagnostic.flavor) for diagnostic in diagnostics] == [
+        ('missing-source', 0x0001, '*'),
+        ('shadowed', 0x4E11, '*'),
+        ('shadowed', 0x6AA4, '*'),
+    ]
+    assert diagnostics[0].message == "0x0001 flavor '*' source 0x0002 not found"
+
+    diagnostics = glyph_mapping_util.validate_mapping(mapping, context, transitive=True)
+    assert [(diagnostic.kind, diagnostic.code_point, diagnostic.flavor) for diagnostic in diagnostics] == [
+        ('shadowed', 0x4E11, '*'),
+        ('shadowed', 0x6AA4, '*'),
+        ('circular', 0x6AA4, None),
+    ]
+
+
+def test_validate_example(assets_dir: Path, glyphs_dir: Path):
+    mapping = glyph_mapping_util.load_mapping(assets_dir.joinpath('mapping-example.yaml'))
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    diagnostics = glyph_mapping_util.validate_mapping(mapping, context)
+    assert [(diagnostic.kind, diagnostic.code_point, diagnostic.flavor) for diagnostic in diagnostics] == [
+        ('missing-source-flavor', 0x0005, 'zh_cn'),
+        ('missing-source-flavor', 0x0005, 'zh_hk'),
+    ]
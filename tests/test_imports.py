@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize('module', [
+    'pixel_font_knife.mono_bitmap',
+    'pixel_font_knife.glyph_file_util',
+    'pixel_font_knife.glyph_mapping_util',
+    'pixel_font_knife.kerning_util',
+])
+def test_lazy_imports(module: str):
+    code = f'import sys, {module}; print(",".join(name for name in ("yaml", "unidata_blocks", "pixel_font_knife.internal.png") if name in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, check=True, text=True).stdout
+    assert output.strip() == ''
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from pixel_font_knife import glyph_file_util, instrument_util
+from pixel_font_knife.instrument_util import Instrument
+from pixel_font_knife.mono_bitmap import MonoBitmap
+
+
+def test_instrument():
+    assert instrument_util.get_instrument() is None
+    with instrument_util.instrument() as instrument:
+        assert instrument_util.get_instrument() is instrument
+        target = Instrument()
+        with instrument_util.instrument(target):
+            assert instrument_util.get_instrument() is target
+        assert instrument_util.get_instrument() is instrument
+    assert instrument_util.get_instrument() is None
+
+
+def test_timed():
+    @instrument_util.timed('stage')
+    def func(x: int) -> int:
+        return x + 1
+
+    assert func(1) == 2
+    with instrument_util.instrument() as instrument:
+        assert func(2) == 3
+        assert func(3) == 4
+    assert func(4) == 5
+    stage = instrument.stages['stage']
+    assert stage.calls == 2
+    assert stage.seconds >= 0
+
+
+def test_glyph_pipeline(glyphs_dir: Path, tmp_path: Path):
+    with instrument_util.instrument() as instrument:
+        context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+        glyph_file = context[0x4E11][None]
+        assert glyph_file.bitmap is glyph_file.bitmap
+        glyph_file.bitmap.save_png(tmp_path.joinpath('4E11.png'))
+        MonoBitmap.load_png(tmp_path.joinpath('4E11.png'))
+
+    assert instrument.stages['load_context'].calls == 1
+    assert instrument.stages['load_context'].items == len(context)
+    assert instrument.stages['glyph_file.bitmap'].cache_misses == 1
+    assert instrument.stages['glyph_file.bitmap'].cache_hits == 2
+    assert instrument.stages['mono_bitmap.load_png'].calls == 2
+    assert instrument.stages['mono_bitmap.load_png'].bytes_read == glyph_file.file_path.stat().st_size + tmp_path.joinpath('4E11.png').stat().st_size
+    assert instrument.stages['mono_bitmap.save_png'].calls == 1
+    assert instrument.stages['mono_bitmap.save_png'].bytes_written == tmp_path.joinpath('4E11.png').stat().st_size
@@ -1,7 +1,11 @@
 from pathlib import Path
 
+import pytest
+
 from pixel_font_knife import glyph_file_util, kerning_util
-from pixel_font_knife.kerning_util import KerningConfig
+from pixel_font_knife.kerning_util import KerningCache, KerningConfig, KerningProfile
+from pixel_font_knife.mono_bitmap import MonoBitmap
+from pixel_font_knife.progress_util import CancelledError, CancelToken
 
 
 def test_calculate_kerning_values(assets_dir: Path, glyphs_dir: Path):
@@ -10,3 +14,276 @@ def test_calculate_kerning_values(assets_dir: Path, glyphs_dir: Path):
     kerning_values = kerning_util.calculate_kerning_values(kerning_config, context)
     assert len(kerning_values) == 1
     assert kerning_values[('u0054', 'u006F')] == -1
+
+
+def test_kerning_profile(glyphs_dir: Path):
+    bitmaps = [MonoBitmap.load_png(file_path) for file_path in sorted(glyphs_dir.joinpath('black').iterdir()) if file_path.suffix == '.png']
+    for left_bitmap in bitmaps:
+        left_bitmap_mask = left_bitmap.pixel_expand(1)
+        left_profile = KerningProfile.create(left_bitmap)
+        for right_bitmap in bitmaps:
+            right_profile = KerningProfile.create(right_bitmap)
+            min_offset = left_profile.calculate_min_offset(right_profile)
+            for offset in range(-left_bitmap.width - right_bitmap.width - 1, 1):
+                x = left_bitmap.width + offset
+                assert left_profile.is_overlapped(right_profile, x) == left_bitmap_mask.is_overlapped(right_bitmap, x=x)
+                if offset >= min_offset:
+                    assert not left_profile.is_overlapped(right_profile, x)
+
+                actual_offset = offset
+                while actual_offset < 0:
+                    if not left_bitmap_mask.is_overlapped(right_bitmap, x=left_bitmap.width + actual_offset):
+                        break
+                    actual_offset += 1
+                assert min(left_profile.calculate_offset(right_profile, offset), 0) == actual_offset
+
+
+def test_calculate_kerning_values_parallel(glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('black'))
+    alphabet = ''.join(chr(code_point) for code_point in sorted(context))
+    kerning_config = KerningConfig(
+        {
+            'left': list(alphabet),
+            'right': list(reversed(alphabet)),
+        },
+        {
+            ('left', 'right'): -6,
+            ('right', 'left'): -3,
+        },
+    )
+    kerning_values = kerning_util.calculate_kerning_values(kerning_config, context)
+    assert len(kerning_values) > 0
+
+    parallel_kerning_values = kerning_util.calculate_kerning_values(kerning_config, context, workers=2, chunk_size=7)
+    assert list(parallel_kerning_values.items()) == list(kerning_values.items())
+
+    cancel_token = CancelToken()
+    progresses = []
+
+    def progress(done: int, total: int):
+        progresses.append(done)
+        if done > 0:
+            cancel_token.cancel()
+
+    with pytest.raises(CancelledError):
+        kerning_util.calculate_kerning_values(kerning_config, context, workers=2, chunk_size=7, progress=progress, cancel_token=cancel_token)
+    assert progresses == [0, 7]
+
+
+def test_calculate_flavors_kerning_values(glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('context'))
+    alphabet = [chr(code_point) for code_point in sorted(context) if code_point >= 0]
+    kerning_config = KerningConfig(
+        {
+            'all': alphabet,
+        },
+        {
+            ('all', 'all'): -8,
+        },
+    )
+    flavors = [None, 'zh_cn', 'zh_hk', 'zh_tw', 'zh_tr', 'ko', 'ja']
+    flavors_kerning_values = kerning_util.calculate_flavors_kerning_values(kerning_config, context, flavors)
+    assert list(flavors_kerning_values) == flavors
+    for flavor in flavors:
+        assert flavors_kerning_values[flavor] == kerning_util.calculate_kerning_values(kerning_config, context, flavor)
+    assert flavors_kerning_values['zh_cn'] != flavors_kerning_values[None]
+    assert flavors_kerning_values['ja'] == flavors_kerning_values[None]
+
+
+def test_compress_kerning_values():
+    kerning_values = {
+        ('T', 'o'): -2,
+        ('T', 'a'): -2,
+        ('T', 'e'): -2,
+        ('V', 'o'): -2,
+        ('V', 'a'): -2,
+        ('V', 'e'): -2,
+        ('V', 'y'): -1,
+        ('W', 'y'): -1,
+        ('Y', 'o'): -1,
+    }
+    class_kerning_values = kerning_util.compress_kerning_values(kerning_values)
+    assert class_kerning_values.left_classes == {}
+    assert class_kerning_values.right_classes == {'right_1': ['a', 'e']}
+    assert class_kerning_values.class_values == {}
+    assert len(class_kerning_values.exceptions) == 9
+    assert class_kerning_values.to_kerning_values() == kerning_values
+
+    kerning_values = {}
+    for left_glyph_name in ['T', 'V', 'W']:
+        for right_glyph_name in ['o', 'a', 'e']:
+            kerning_values[(left_glyph_name, right_glyph_name)] = -2
+        kerning_values[(left_glyph_name, 'y')] = -1
+    kerning_values[('L', 'y')] = -3
+    class_kerning_values = kerning_util.compress_kerning_values(kerning_values)
+    assert class_kerning_values.left_classes == {'left_1': ['T', 'V', 'W']}
+    assert class_kerning_values.right_classes == {'right_1': ['o', 'a', 'e']}
+    assert class_kerning_values.class_values == {('left_1', 'right_1'): -2}
+    assert class_kerning_values.exceptions == {
+        ('T', 'y'): -1,
+        ('V', 'y'): -1,
+        ('W', 'y'): -1,
+        ('L', 'y'): -3,
+    }
+    assert class_kerning_values.to_kerning_values() == kerning_values
+
+
+def test_kerning_cache(assets_dir: Path, glyphs_dir: Path, tmp_path: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('kerning'))
+    kerning_config = KerningConfig.load(assets_dir.joinpath('kerning-example.yaml'))
+    cache_path = tmp_path.joinpath('kerning-cache.json')
+
+    cache = KerningCache.load(cache_path)
+    assert len(cache.values) == 0
+    kerning_values = kerning_util.calculate_kerning_values(kerning_config, context, cache=cache)
+    assert kerning_values == {('u0054', 'u006F'): -1}
+    assert len(cache.values) == 1
+    cache.save(cache_path)
+
+    cache = KerningCache.load(cache_path)
+    assert len(cache.values) == 1
+    key = next(iter(cache.values))
+    assert key[0] == context[0x0054].get_file().bitmap.calculate_content_hash()
+    assert key[1] == context[0x006F].get_file().bitmap.calculate_content_hash()
+    assert key[2:] == (-1, 1, 'square')
+    cache.values[key] = -5
+    assert kerning_util.calculate_kerning_values(kerning_config, context, cache=cache) == {('u0054', 'u006F'): -5}
+
+
+
+def test_kerning_cache_corrupt(assets_dir: Path, glyphs_dir: Path, tmp_path: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('kerning'))
+    kerning_config = KerningConfig.load(assets_dir.joinpath('kerning-example.yaml'))
+    cache_path = tmp_path.joinpath('kerning-cache.json')
+
+    cache = KerningCache()
+    kerning_util.calculate_kerning_values(kerning_config, context, cache=cache)
+    cache.save(cache_path)
+    assert list(tmp_path.iterdir()) == [cache_path]
+    cache_bytes = cache_path.read_bytes()
+
+    for corrupt_bytes in (cache_bytes[:len(cache_bytes) // 2], b'[1, 2]', b'{"version": 2, "values": [[1]]}', b'\xff'):
+        cache_path.write_bytes(corrupt_bytes)
+        cache = KerningCache.load(cache_path)
+        assert len(cache.values) == 0
+        assert kerning_util.calculate_kerning_values(kerning_config, context, cache=cache) == {('u0054', 'u006F'): -1}
+        cache.save(cache_path)
+        assert cache_path.read_bytes() == cache_bytes
+
+def test_compile_kerning_config(glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('kerning'))
+    kerning_config = KerningConfig(
+        {
+            'latin_T': list('TTA'),
+            'latin_o': list('oob'),
+            'latin_x': list('x'),
+        },
+        {
+            ('latin_T', 'latin_o'): -1,
+            ('latin_o', 'latin_T'): -2,
+            ('latin_T', 'latin_x'): 1,
+        },
+    )
+
+    compiled_kerning_config = kerning_config.compile()
+    assert compiled_kerning_config.templates == {('latin_T', 'latin_o'): -1, ('latin_o', 'latin_T'): -2}
+    assert {group_name: list(code_points) for group_name, code_points in compiled_kerning_config.groups.items()} == {
+        'latin_T': [0x0054, 0x0041],
+        'latin_o': [0x006F, 0x0062],
+    }
+
+    compiled_kerning_config = kerning_config.compile(context)
+    assert {group_name: list(code_points) for group_name, code_points in compiled_kerning_config.groups.items()} == {
+        'latin_T': [0x0054],
+        'latin_o': [0x006F],
+    }
+
+    kerning_values = kerning_util.calculate_kerning_values(kerning_config, context)
+    assert kerning_util.calculate_kerning_values(compiled_kerning_config, context) == kerning_values
+    assert kerning_values[('u0054', 'u006F')] == -1
+
+
+def test_kerning_profile_expand(glyphs_dir: Path):
+    shapes = {
+        'square': lambda dx, dy, size: True,
+        'diamond': lambda dx, dy, size: abs(dx) + abs(dy) <= size,
+        'cross': lambda dx, dy, size: dx == 0 or dy == 0,
+        'horizontal': lambda dx, dy, size: dy == 0,
+    }
+    for file_path in glyphs_dir.joinpath('black').iterdir():
+        if file_path.suffix != '.png':
+            continue
+
+        bitmap = MonoBitmap.load_png(file_path)
+        for size in range(1, 4):
+            for shape, is_inside_shape in shapes.items():
+                bitmap_mask = bitmap.copy()
+                for y, bitmap_row in enumerate(bitmap):
+                    for x, pixel in enumerate(bitmap_row):
+                        if pixel == 0:
+                            continue
+                        for dy in range(-size, size + 1):
+                            for dx in range(-size, size + 1):
+                                if bitmap.is_inside(x + dx, y + dy) and is_inside_shape(dx, dy, size):
+                                    bitmap_mask[y + dy][x + dx] = 1
+                if shape == 'square':
+                    assert bitmap_mask == bitmap.pixel_expand(size)
+
+                profile = KerningProfile.create(bitmap, size, shape)
+                assert profile.mask_rows == KerningProfile.create(bitmap_mask).rows
+
+    with pytest.raises(ValueError):
+        KerningProfile.create(MonoBitmap.create(2, 2), 0)
+    with pytest.raises(ValueError):
+        KerningProfile.create(MonoBitmap.create(2, 2), 1, 'circle')
+
+
+def test_calculate_kerning_values_expand(assets_dir: Path, glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('kerning'))
+    kerning_config = KerningConfig.load(assets_dir.joinpath('kerning-example.yaml'))
+    assert kerning_util.calculate_kerning_values(kerning_config, context, expand_size=1, expand_shape='horizontal') == {('u0054', 'u006F'): -1}
+    assert kerning_util.calculate_kerning_values(kerning_config, context, expand_size=2, expand_shape='diamond') == {('u0054', 'u006F'): -1}
+
+
+def test_calculate_kerning_values_progress(assets_dir: Path, glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('kerning'))
+    kerning_config = KerningConfig.load(assets_dir.joinpath('kerning-example.yaml'))
+
+    progresses = []
+    kerning_values = kerning_util.calculate_kerning_values(kerning_config, context, progress=lambda done, total: progresses.append((done, total)))
+    assert kerning_values == {('u0054', 'u006F'): -1}
+    assert progresses == [(0, 1), (1, 1)]
+
+    cache = KerningCache()
+    cancel_token = CancelToken()
+    cancel_token.cancel()
+    with pytest.raises(CancelledError):
+        kerning_util.calculate_kerning_values(kerning_config, context, cache=cache, cancel_token=cancel_token)
+    assert len(cache.values) == 0
+
+    with pytest.raises(CancelledError):
+        kerning_util.calculate_kerning_values(kerning_config, context, workers=2, cancel_token=cancel_token)
+
+
+def test_calculate_kerning_values_cancel_profiles(glyphs_dir: Path):
+    context = glyph_file_util.load_context(glyphs_dir.joinpath('black'))
+    kerning_config = KerningConfig({'all': [chr(code_point) for code_point in sorted(context)]}, {('all', 'all'): -1})
+
+    class CountingCancelToken(CancelToken):
+        __slots__ = ('checks',)
+
+        def __init__(self):
+            super().__init__()
+            self.checks = 0
+
+        def raise_if_cancelled(self):
+            self.checks += 1
+            if self.checks == 3:
+                self.cancel()
+            super().raise_if_cancelled()
+
+    cancel_token = CountingCancelToken()
+    with pytest.raises(CancelledError):
+        kerning_util.calculate_kerning_values(kerning_config, context, cancel_token=cancel_token)
+    assert cancel_token.checks == 3
+    assert sum(glyph_file._bitmap is not None for flavor_group in context.values() for glyph_file in flavor_group.values()) == 2
@@ -250,6 +250,26 @@ def test_eq():
     assert bitmap_1 == bitmap_2
 
 
+def test_calculate_content_hash(glyphs_dir: Path):
+    bitmap_1 = MonoBitmap([
+        [0, 1],
+        [1, 0],
+    ])
+    bitmap_2 = MonoBitmap([
+        [0, 1, 1, 0],
+    ])
+    assert bitmap_1.calculate_content_hash() == bitmap_1.copy().calculate_content_hash()
+    assert bitmap_1.calculate_content_hash() != bitmap_2.calculate_content_hash()
+    assert bitmap_1.calculate_content_hash() != bitmap_1.resize(right=1).calculate_content_hash()
+
+    for file_path in glyphs_dir.joinpath('black').iterdir():
+        if file_path.suffix != '.png':
+            continue
+        black_bitmap = MonoBitmap.load_png(file_path)
+        red_bitmap = MonoBitmap.load_png(glyphs_dir.joinpath('red', file_path.name))
+        assert black_bitmap.calculate_content_hash() == red_bitmap.calculate_content_hash()
+
+
 def test_load_dump_save(glyphs_dir: Path, tmp_path: Path):
     black_load_dir = glyphs_dir.joinpath('black')
     black_save_dir = tmp_path.joinpath('black')
@@ -0,0 +1,14 @@
+import pytest
+
+from pixel_font_knife.progress_util import CancelledError, CancelToken
+
+
+def test_cancel_token():
+    cancel_token = CancelToken()
+    assert not cancel_token.cancelled
+    cancel_token.raise_if_cancelled()
+
+    cancel_token.cancel()
+    assert cancel_token.cancelled
+    with pytest.raises(CancelledError):
+        cancel_token.raise_if_cancelled()
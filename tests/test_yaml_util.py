@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from pixel_font_knife import yaml_util
+
+
+def test_load_yaml(assets_dir: Path, tmp_path: Path):
+    file_path = assets_dir.joinpath('kerning-example.yaml')
+    data = yaml_util.load_yaml(file_path)
+    assert data == {
+        'groups': {
+            'latin_T': 'T',
+            'latin_o': 'o',
+        },
+        'templates': {
+            'latin_T,latin_o': -1,
+        },
+    }
+
+    cache_dir = tmp_path.joinpath('cache')
+    assert yaml_util.load_yaml(file_path, cache_dir) == data
+    cache_paths = list(cache_dir.iterdir())
+    assert len(cache_paths) == 1
+    assert cache_paths[0].suffix == '.marshal'
+    assert yaml_util.load_yaml(file_path, cache_dir) == data
+    assert list(cache_dir.iterdir()) == cache_paths
+
+
+def test_load_yaml_corrupt_cache(assets_dir: Path, tmp_path: Path):
+    file_path = assets_dir.joinpath('kerning-example.yaml')
+    data = yaml_util.load_yaml(file_path)
+    cache_dir = tmp_path.joinpath('cache')
+    yaml_util.load_yaml(file_path, cache_dir)
+    cache_path = next(cache_dir.iterdir())
+
+    cache_bytes = cache_path.read_bytes()
+    cache_path.write_bytes(cache_bytes[:10])
+    assert yaml_util.load_yaml(file_path, cache_dir) == data
+    assert cache_path.read_bytes() == cache_bytes
+    assert yaml_util.load_yaml(file_path, cache_dir) == data
+    assert list(cache_dir.iterdir()) == [cache_path]
+
+
+def test_load_yaml_uncacheable(tmp_path: Path):
+    file_path = tmp_path.joinpath('date.yaml')
+    file_path.write_text('date: 2024-01-01\n', 'utf-8')
+    cache_dir = tmp_path.joinpath('cache')
+    data = yaml_util.load_yaml(file_path, cache_dir)
+    assert str(data['date']) == '2024-01-01'
+    assert not cache_dir.exists()